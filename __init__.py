@@ -1,7 +1,11 @@
+import os
+import sqlite3
 from flask import Flask
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 """
 These object can be used throughout project.
@@ -12,16 +16,114 @@ These object can be used throughout project.
 # Setup of key Flask object (app)
 app = Flask(__name__)
 # Setup SQLAlchemy object and properties for the database (db)
-dbURI = 'sqlite:///volumes/sqlite.db'
+dbURI = os.environ.get('DATABASE_URL', 'sqlite:///volumes/sqlite.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_DATABASE_URI'] = dbURI
-app.config['SECRET_KEY'] = 'SECRET_KEY'
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'SECRET_KEY')  # also signs auth tokens, must match across workers
 db = SQLAlchemy()
 # db.drop_all()
 
-Migrate(app, db)
-
 # Images storage
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # maximum size of uploaded content
 app.config['UPLOAD_EXTENSIONS'] = ['.jpg', '.png', '.gif']  # supported file types
 app.config['UPLOAD_FOLDER'] = 'volumes/uploads/'  # location of user uploaded content
+
+# API collection paging
+app.config['API_PAGE_SIZE'] = 100  # rows per page when a client does not send ?limit=
+app.config['API_PAGE_SIZE_MAX'] = 1000  # hard cap on ?limit=, keeps every page the same cost
+app.config['API_STREAM_BATCH'] = 1000  # rows fetched per round trip when a list is streamed
+app.config['API_BULK_MAX'] = 50000  # items accepted by one /bulk request, bodies are also capped by MAX_CONTENT_LENGTH
+
+# Signed auth tokens from /api/users/authenticate, verified without a database lookup (see api/auth.py)
+app.config['AUTH_TOKEN_MAX_AGE'] = 3600  # seconds a token is accepted after it was issued
+app.config['AUTH_HASH_WORKERS'] = int(os.environ.get('AUTH_HASH_WORKERS', 2))  # password hashes running at once per worker
+app.config['AUTH_HASH_QUEUE'] = 16  # logins waiting for a hash slot before new ones get 503
+app.config['AUTH_HASH_WAIT'] = 5  # seconds a login waits for a slot
+
+# Encoded responses of the conditional read endpoints, keyed on endpoint, query string and table versions
+app.config['RESPONSE_CACHE_BYTES'] = int(os.environ.get('RESPONSE_CACHE_BYTES', 32 * 1024 * 1024))  # body bytes kept in memory per worker, 0 turns caching off
+app.config['RESPONSE_CACHE_ITEM_MAX'] = 4 * 1024 * 1024  # bodies larger than this are never cached
+app.config['RESPONSE_CACHE_FOLDER'] = os.environ.get('RESPONSE_CACHE_FOLDER')  # e.g. volumes/responses/, shared by all workers
+app.config['RESPONSE_CACHE_DISK_BYTES'] = 256 * 1024 * 1024  # size of the shared folder before old entries are removed
+
+# SQL diagnostics, slow query log, N+1 warnings and query budgets (see api/diagnostics.py), off unless SQL_DIAGNOSTICS=1
+app.config['SQL_DIAGNOSTICS'] = os.environ.get('SQL_DIAGNOSTICS', '').lower() in ('1', 'true')
+app.config['SQL_SLOW_MS'] = float(os.environ.get('SQL_SLOW_MS', 100))  # statements slower than this are logged
+app.config['SQL_REPEAT_LIMIT'] = 10  # runs of one statement shape per request before it is reported as N+1
+app.config['SQL_QUERY_BUDGETS'] = {  # route -> most statements one request should need, version lookup included
+    '/api/users/': 3,
+    '/api/users/authenticate': 1,
+    '/api/recipes/': 2,
+    '/api/recipes/facets': 2,
+    '/api/fridges/': 2,
+    '/api/nutriitons/': 2,
+    '/api/nutriitons/totals': 2,
+    '/api/scores/': 2,
+    '/api/scores/top': 2,
+    '/api/scores/rank/<string:name>': 2,
+    '/api/search': 1,
+    '/api/search/': 1,
+    '/api/jokes/': 1,
+    '/api/jokes/top': 1,
+}
+
+# Joke counters, 'sql' is shared by all workers and survives restarts, 'memory' is per process
+app.config['JOKE_STORE'] = os.environ.get('JOKE_STORE', 'sql')
+
+# COVID upstream proxy, cached under volumes/ and shared by all workers
+app.config['COVID_API_URL'] = os.environ.get('COVID_API_URL', 'https://corona-virus-world-and-india-data.p.rapidapi.com/api')
+app.config['COVID_API_KEY'] = os.environ.get('COVID_API_KEY', 'dec069b877msh0d9d0827664078cp1a18fajsn2afac35ae063')
+app.config['COVID_CACHE_FOLDER'] = os.environ.get('COVID_CACHE_FOLDER', 'volumes/')  # last good payload survives restarts
+app.config['COVID_CACHE_TTL'] = 86400  # fresh for 24 hours
+app.config['COVID_CACHE_STALE'] = 86400  # then served stale for up to a day while refreshing in the background
+app.config['COVID_CACHE_RETRY'] = 60  # seconds without upstream calls after a failed one
+
+# SQLite engine profile, PRAGMAs applied to every new connection (see benchmarks/sqlite_profile.py)
+# -- production: WAL lets readers run beside the single writer, NORMAL syncs only at checkpoints,
+#    busy_timeout makes concurrent gunicorn writers wait instead of failing with "database is locked"
+# -- default: SQLite's own settings, rollback journal with a full fsync per commit
+SQLITE_PROFILES = {
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,  # milliseconds
+        'mmap_size': 256 * 1024 * 1024,  # bytes of the database file read through memory mapping
+        'cache_size': -64 * 1024,  # negative is KiB, 64 MiB page cache per connection
+        'temp_store': 'MEMORY',
+    },
+    'default': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+    },
+}
+app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'production')
+app.config['SQLITE_PRAGMAS'] = SQLITE_PROFILES[app.config['SQLITE_PROFILE']]
+
+# Connection pool, only the settings given in the environment are passed to the engine
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    option: int(os.environ[env])
+    for option, env in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                        ('pool_timeout', 'DB_POOL_TIMEOUT'), ('pool_recycle', 'DB_POOL_RECYCLE'))
+    if env in os.environ
+}
+
+
+# Applies PRAGMAs to a raw sqlite3 connection
+def apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in pragmas.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+@event.listens_for(Engine, "connect")
+def sqlite_profile(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        apply_pragmas(dbapi_connection, app.config['SQLITE_PRAGMAS'])
+
+# Bind the database once configuration is complete, schema and seed data come from `python manage.py init-db` / `seed`
+db.init_app(app)
+Migrate(app, db)
+# Token based logins, the request loader lives in api/auth.py
+login_manager = LoginManager()
+login_manager.init_app(app)
@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import jsonify
+from flask_login import UserMixin
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.security import check_password_hash
+
+from __init__ import app, login_manager
+
+"""Token authentication shared by the protected endpoints
+  /api/users/authenticate checks the password once and returns a token,
+  signed with SECRET_KEY and stamped with the time it was issued. Clients send
+  it back as "Authorization: Bearer <token>"; the request loader below checks
+  the signature and age and rebuilds the user from the token itself, so a
+  protected request costs no database query and no password hash.
+  A token stays valid until AUTH_TOKEN_MAX_AGE even if the password changes.
+
+  Password checks run in a small thread pool, at most AUTH_HASH_WORKERS at
+  once and AUTH_HASH_QUEUE waiting, so a burst of logins is turned away with
+  a 503 instead of tying up every worker thread.
+"""
+
+TOKEN_SALT = 'auth-token'  # keeps these signatures apart from anything else signed with SECRET_KEY
+
+_serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt=TOKEN_SALT)
+_hash_pool = ThreadPoolExecutor(max_workers=app.config['AUTH_HASH_WORKERS'], thread_name_prefix='password-hash')
+_hash_slots = threading.BoundedSemaphore(app.config['AUTH_HASH_WORKERS'] + app.config['AUTH_HASH_QUEUE'])
+
+
+# The signed in user as carried by a token, enough for flask_login and for read()
+class TokenUser(UserMixin):
+    def __init__(self, id, uid, name):
+        self.id = id
+        self.uid = uid
+        self.name = name
+
+    def read(self):
+        return {"id": self.id, "uid": self.uid, "name": self.name}
+
+
+# Signed token for a user
+# returns string
+def issue_token(user):
+    return _serializer.dumps({"id": user.id, "uid": user.uid, "name": user.name})
+
+
+# User from a token, None when the signature is wrong or the token is older than AUTH_TOKEN_MAX_AGE
+# returns TokenUser or None
+def read_token(token):
+    try:
+        claims = _serializer.loads(token, max_age=app.config['AUTH_TOKEN_MAX_AGE'])
+    except (SignatureExpired, BadSignature):
+        return None
+    return TokenUser(claims['id'], claims['uid'], claims['name'])
+
+
+"""Password Check
+  Runs check_password_hash for user in the hash pool
+Returns:
+    Boolean: True when the password matches, None when the pool is full
+"""
+def check_password(user, password):
+    if password is None:
+        return False
+    if not _hash_slots.acquire(timeout=app.config['AUTH_HASH_WAIT']):
+        return None
+    try:
+        return _hash_pool.submit(check_password_hash, user._password, password).result()
+    finally:
+        _hash_slots.release()
+
+
+@login_manager.request_loader
+def load_token(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return read_token(token.strip())
+
+
+@login_manager.unauthorized_handler
+def unauthorized():
+    response = jsonify({'message': 'Missing, invalid or expired token'})
+    response.status_code = 401
+    response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
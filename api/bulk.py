@@ -0,0 +1,105 @@
+from flask import request, jsonify, current_app
+from sqlalchemy import insert, inspect
+from sqlalchemy.exc import IntegrityError
+
+from __init__ import db
+
+"""Shared helper for the bulk (array) create endpoints
+  The whole batch is validated first, then every valid item is inserted with a
+  single executemany in one transaction, one commit (and fsync) per batch
+  instead of one per row. Invalid items are reported by their index.
+"""
+
+UNIQUE_CHUNK = 500  # ids per IN (...) when checking unique columns, below SQLite's variable limit
+
+
+"""Text Field Check
+  name: key of a required string field of body, at least 2 characters, for the validate() functions
+Returns:
+    Tuple: (value, None), or (None, error message)
+"""
+def text_field(body, name):
+    value = body.get(name)
+    if value is not None and not isinstance(value, str):
+        return None, f'{name} must be a string'
+    if value is None or len(value) < 2:
+        return None, f'{name} is missing, or is less than 2 characters'
+    return value, None
+
+
+"""Unique Column Check
+  rows: list of (index, column values) already validated
+Returns:
+    List: errors for rows that repeat a unique value, in the batch or in the table
+"""
+def unique_errors(model, rows):
+    errors = []
+    for column in model.__table__.columns:
+        if not column.unique or column.primary_key:
+            continue
+        values = [values[column.key] for _, values in rows]
+        existing = set()
+        for start in range(0, len(values), UNIQUE_CHUNK):
+            chunk = values[start:start + UNIQUE_CHUNK]
+            existing.update(db.session.execute(db.select(column).where(column.in_(chunk))).scalars())
+        seen = set()
+        for index, values in rows:
+            value = values[column.key]
+            if value in existing or value in seen:
+                errors.append({'index': index, 'message': f'{column.key.lstrip("_")} {value} is duplicate'})
+            seen.add(value)
+    return errors
+
+
+"""Bulk Create Response
+  model: model class, each valid item is passed to its constructor to get the column values
+  validate: body -> (fields, None) or (None, message), the same check as the single _Create
+Returns:
+    Response: {'created': n, 'errors': [{'index', 'message'}]}, 400 when nothing could be created
+"""
+def bulk_create(model, validate):
+    body = request.get_json(silent=True)
+    if not isinstance(body, list):
+        return {'message': 'body must be a JSON array of objects'}, 400
+    if len(body) > current_app.config['API_BULK_MAX']:
+        return {'message': f'at most {current_app.config["API_BULK_MAX"]} items per request'}, 400
+
+    mapper = inspect(model)
+    columns = [(column.key, mapper.get_property_by_column(column).key)
+               for column in model.__table__.columns if not column.primary_key]
+
+    rows = []
+    errors = []
+    for index, item in enumerate(body):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'message': 'item must be an object'})
+            continue
+        try:
+            fields, message = validate(item)
+        except TypeError:
+            fields, message = None, 'fields must be strings'
+        if message is not None:
+            errors.append({'index': index, 'message': message})
+            continue
+        record = model(**fields)  # the constructor fills derived columns, the object never joins the session
+        rows.append((index, {key: getattr(record, attribute) for key, attribute in columns}))
+
+    if rows:
+        duplicates = unique_errors(model, rows)
+        if duplicates:
+            rejected = {error['index'] for error in duplicates}
+            rows = [row for row in rows if row[0] not in rejected]
+            errors = sorted(errors + duplicates, key=lambda error: error['index'])
+
+    if rows:
+        try:
+            db.session.execute(insert(model.__table__), [values for _, values in rows])  # executemany
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            return {'message': f'Batch rejected, nothing was created: {e.orig}', 'errors': errors}, 400
+
+    response = jsonify({'created': len(rows), 'errors': errors})
+    if not rows and errors:
+        response.status_code = 400
+    return response
@@ -0,0 +1,19 @@
+from flask import Blueprint, jsonify
+from flask_restful import Api, Resource # used for REST API building
+
+from api.conditional import response_cache
+
+cache_api = Blueprint('cache_api', __name__,
+                   url_prefix='/api/cache')
+
+# API docs https://flask-restful.readthedocs.io/en/latest/api.html
+api = Api(cache_api)
+
+class CacheAPI:
+    class _ReadStats(Resource):
+        def get(self):
+            ''' Response cache counters of the worker that answers, for debugging, /metrics totals all workers '''
+            return jsonify(response_cache.stats())
+
+    # building RESTapi endpoint
+    api.add_resource(_ReadStats, '/stats')
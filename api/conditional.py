@@ -0,0 +1,92 @@
+import math
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, current_app
+
+from __init__ import app
+from model.versions import TableVersion
+from model.responsecache import ResponseCache
+from api.listing import stream_mode
+from api.metrics import cache_event
+
+"""Conditional GET and response caching for read endpoints
+  A response is built only from its tables, so their version counters
+  (model/versions.py) identify it. The versions are looked up before the
+  endpoint runs: an If-None-Match with the current ETag, or an
+  If-Modified-Since no older than the last change, gets an empty 304
+  without the main tables being read. The ETag also carries the time of
+  the last change, so counters restarted by a rebuilt database do not
+  match old tags.
+
+  Other requests are served from response_cache when the same host, endpoint
+  and query string were already encoded at these versions. Only on a miss does
+  the endpoint run its queries, and its 200 body is stored for the next one.
+  A write moves the version, so it never needs to find and drop entries.
+
+  The versions are read before the endpoint's queries, so a body is never
+  older than its tag. A write landing in between makes the tag older than
+  the body, which only costs one more full response.
+"""
+
+CACHED_HEADERS = ('Content-Type', 'X-Next-Cursor', 'Link')
+
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_BYTES'], app.config['RESPONSE_CACHE_ITEM_MAX'],
+                               app.config['RESPONSE_CACHE_FOLDER'], app.config['RESPONSE_CACHE_DISK_BYTES'],
+                               record=cache_event)
+
+
+"""Conditional Decorator
+  models: model classes whose tables the response is built from
+Returns:
+    Function: decorator for a Resource get method
+"""
+def conditional(*models):
+    tables = [model.__tablename__ for model in models]
+
+    def decorator(get):
+        @wraps(get)
+        def wrapper(*args, **kwargs):
+            versions, modified = TableVersion.of(tables)
+            # the change time, in milliseconds, keeps a tag from matching a rebuilt database whose counters restarted
+            etag = '-'.join(str(versions.get(table, 0)) for table in tables) + f'@{int(modified * 1000)}'
+            mode = stream_mode()
+            if mode is not None:
+                etag += '-' + mode  # streamed bodies differ from pages of the same URL
+            # HTTP dates are whole seconds: rounded up, so a change later in the same second is still newer than
+            # a date handed out before it, and only handed out once that second is over
+            last_modified = datetime.fromtimestamp(math.ceil(modified), timezone.utc)
+            settled = math.ceil(modified) <= time.time()
+
+            if request.if_none_match:
+                unchanged = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                unchanged = since is not None and last_modified <= since
+            if unchanged:
+                response = current_app.response_class(status=304)
+            else:
+                # streamed exports are not cached, they are meant to be larger than memory
+                # -- the host is part of the key, cached Link headers are absolute URLs
+                key = None if mode is not None else \
+                    f"{request.host_url}{request.endpoint}?{sorted(request.args.items(multi=True))}#{etag}"
+                cached = response_cache.get(key) if key is not None else None
+                if cached is not None:
+                    body, headers = cached
+                    response = current_app.response_class(body, headers=headers)
+                    response.headers['X-Cache'] = 'HIT'
+                else:
+                    response = get(*args, **kwargs)
+                    if not isinstance(response, current_app.response_class) or response.status_code != 200:
+                        return response  # errors are not cached
+                    if key is not None:
+                        response_cache.put(key, response.get_data(),
+                                           {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers})
+                        response.headers['X-Cache'] = 'MISS'
+            response.set_etag(etag, weak=True)
+            if settled:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'no-cache'  # clients revalidate on every poll
+            return response
+        return wrapper
+    return decorator
@@ -1,8 +1,11 @@
-from contextlib import nullcontext
-from flask import Blueprint, jsonify  # jsonify creates an endpoint response object
+from flask import Blueprint, Response
 from flask_restful import Api, Resource # used for REST API building
 import requests  # used for testing 
-import time
+import json
+
+from __init__ import app
+from model.swrcache import SWRCache
+from api.metrics import upstream
 
 # Blueprints enable python code to be organized in multiple files and directories https://flask.palletsprojects.com/en/2.2.x/blueprints/
 covid_api = Blueprint('covid_api', __name__,
@@ -11,72 +14,107 @@ covid_api = Blueprint('covid_api', __name__,
 # API generator https://flask-restful.readthedocs.io/en/latest/api.html#id1
 api = Api(covid_api)
 
-"""Time Keeper
+"""Upstream Fetch
+  RapidAPI is the world's largest API Marketplace. 
+  Developers use Rapid API to discover and connect to thousands of APIs. 
 Returns:
-    Boolean: is it time to update?
+    Dictionary: decoded API response, raises on a failed request
 """
-def updateTime():
-    global last_run  # the last_run global is preserved between calls to function
-    try: last_run
-    except: last_run = None
-    
-    # initialize last_run data
-    if last_run is None:
-        last_run = time.time()
-        return True
-    
-    # calculate time since last update
-    elapsed = time.time() - last_run
-    if elapsed > 86400:  # update every 24 hours
-        last_run = time.time()
-        return True
-    
-    return False
+def fetchCovidAPI():
+    headers = {
+        'x-rapidapi-key': app.config['COVID_API_KEY'],
+        'x-rapidapi-host': "corona-virus-world-and-india-data.p.rapidapi.com"
+    }
+    with upstream('covid'):
+        response = requests.request("GET", app.config['COVID_API_URL'], headers=headers, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+
+"""Alternate country names
+  Lower case alias or ISO 3166 code -> lower case country_name used by the upstream payload
+"""
+COUNTRY_ALIASES = {
+    'us': 'usa', 'united states': 'usa', 'united states of america': 'usa',
+    'gb': 'uk', 'gbr': 'uk', 'united kingdom': 'uk', 'great britain': 'uk',
+    'kr': 's. korea', 'kor': 's. korea', 'south korea': 's. korea', 'korea': 's. korea',
+    'ae': 'uae', 'are': 'uae', 'united arab emirates': 'uae',
+    'cd': 'drc', 'cod': 'drc', 'democratic republic of the congo': 'drc',
+    'cf': 'car', 'caf': 'car', 'central african republic': 'car',
+    'cz': 'czechia', 'cze': 'czechia', 'czech republic': 'czechia',
+    'in': 'india', 'ind': 'india', 'br': 'brazil', 'bra': 'brazil',
+    'fr': 'france', 'fra': 'france', 'de': 'germany', 'deu': 'germany',
+    'it': 'italy', 'ita': 'italy', 'es': 'spain', 'esp': 'spain',
+    'ru': 'russia', 'rus': 'russia', 'russian federation': 'russia',
+    'tr': 'turkey', 'tur': 'turkey', 'turkiye': 'turkey',
+    'jp': 'japan', 'jpn': 'japan', 'cn': 'china', 'chn': 'china',
+    'vn': 'vietnam', 'vnm': 'vietnam', 'viet nam': 'vietnam',
+    'mx': 'mexico', 'mex': 'mexico', 'ca': 'canada', 'can': 'canada',
+    'au': 'australia', 'aus': 'australia', 'nz': 'new zealand', 'nzl': 'new zealand',
+    'ar': 'argentina', 'arg': 'argentina', 'nl': 'netherlands', 'nld': 'netherlands',
+    'ir': 'iran', 'irn': 'iran', 'za': 'south africa', 'zaf': 'south africa',
+    'ph': 'philippines', 'phl': 'philippines', 'sg': 'singapore', 'sgp': 'singapore',
+    'tw': 'taiwan', 'twn': 'taiwan', 'hk': 'hong kong', 'hkg': 'hong kong',
+}
+
+
+"""Prepare Covid Data
+  Runs once per refresh, so requests only do dictionary lookups and write bytes
+Returns:
+    Dictionary: 'body' bytes of the full payload,
+                'countries' lower case name/alias -> (country dictionary, json bytes)
+"""
+def prepareCovid(payload):
+    countries = {}
+    for country in payload.get('countries_stat') or []:
+        countries[country["country_name"].lower()] = (country, json.dumps(country).encode() + b"\n")
+    for alias, name in COUNTRY_ALIASES.items():
+        if alias not in countries and name in countries:
+            countries[alias] = countries[name]
+    return {'body': json.dumps(payload).encode() + b"\n", 'countries': countries}
+
+
+"""
+Preserve Service usage / speed time with a Reasonable refresh delay
+  Served from memory while fresh, served stale while one worker refreshes in the background,
+  and persisted to volumes/ so a restarted worker answers without waiting on upstream.
+  After a failed fetch upstream is left alone for COVID_CACHE_RETRY seconds, so an outage
+  does not make every request wait out the timeout.
+"""
+covid_cache = SWRCache('covid', fetchCovidAPI, app.config['COVID_CACHE_FOLDER'], prepare=prepareCovid,
+                       ttl=app.config['COVID_CACHE_TTL'], stale=app.config['COVID_CACHE_STALE'],
+                       retry=app.config['COVID_CACHE_RETRY'])
+
 
 """API Handler
 Returns:
-    String: API response
+    Dictionary: API response, None when upstream has never answered
 """   
 def getCovidAPI():
-    global covid_data  # the covid_data global is preserved between calls to function
-    try: covid_data
-    except: covid_data = None
+    return covid_cache.get()
 
-    """
-    Preserve Service usage / speed time with a Reasonable refresh delay
-    """
-    if updateTime(): # request Covid data
-        """
-        RapidAPI is the world's largest API Marketplace. 
-        Developers use Rapid API to discover and connect to thousands of APIs. 
-        """
-        url = "https://corona-virus-world-and-india-data.p.rapidapi.com/api"
-        headers = {
-            'x-rapidapi-key': "dec069b877msh0d9d0827664078cp1a18fajsn2afac35ae063",
-            'x-rapidapi-host': "corona-virus-world-and-india-data.p.rapidapi.com"
-        }
-        response = requests.request("GET", url, headers=headers)
-        covid_data = response
-    else:  # Request Covid Data
-        response = covid_data
-
-    return response
+
+"""API with Country Filter
+  Case insensitive, also accepts aliases and ISO codes (see COUNTRY_ALIASES)
+Returns:
+    Tuple: (country dictionary, json bytes), None when not found or unavailable
+"""   
+def findCountry(filter):
+    prepared = covid_cache.prepared()
+    if prepared is None:
+        return None
+    return prepared['countries'].get(filter.lower())
 
 
 """API with Country Filter
 Returns:
-    String: Filter of API response
+    Dictionary: Filter of API response
 """   
 def getCountry(filter):
-    # Request Covid Data
-    response = getCovidAPI()
-    # Look for Country    
-    countries = response.json().get('countries_stat')
-    for country in countries:  # countries is a list
-        if country["country_name"].lower() == filter.lower():  # this filters for country
-            return country
-    
-    return {"message": filter + " not found"}
+    found = findCountry(filter)
+    if found is None:
+        return {"message": filter + " not found"}
+    return found[0]
 
 
 """Defines API Resources 
@@ -86,12 +124,21 @@ class CovidAPI:
     """API Method to GET all Covid Data"""
     class _Read(Resource):
         def get(self):
-            return getCovidAPI().json()
+            prepared = covid_cache.prepared()
+            if prepared is None:
+                return {"message": "Covid data is unavailable"}, 503
+            return Response(prepared['body'], mimetype='application/json')
         
     """API Method to GET Covid Data for a Specific Country"""
     class _ReadCountry(Resource):
         def get(self, filter):
-            return jsonify(getCountry(filter))
+            prepared = covid_cache.prepared()
+            if prepared is None:
+                return {"message": "Covid data is unavailable"}, 503
+            found = prepared['countries'].get(filter.lower())
+            if found is None:
+                return {"message": filter + " not found"}, 404
+            return Response(found[1], mimetype='application/json')
     
     # resource is called an endpoint: base usr + prefix + endpoint
     api.add_resource(_Read, '/')
@@ -99,27 +146,54 @@ class CovidAPI:
 
 
 """Main or Tester Condition 
-  This code only runs when this file is "played" directly
+  This code only runs when this module is run directly, from the project root: python -m api.covid
+  A local stand-in server replaces RapidAPI, so the cache can be exercised offline
 """        
 if __name__ == "__main__": 
     """
     Using this test code is how I built the backend logic around this API.  
     There were at least 10 debugging session, on handling updateTime.
     """
+    import tempfile, threading, time
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    calls = []  # upstream hits seen by the stand-in server
+    class StandIn(BaseHTTPRequestHandler):
+        def do_GET(self):
+            calls.append(self.path)
+            body = json.dumps({
+                "world_total": {"total_cases": str(len(calls))},
+                "countries_stat": [{"country_name": "USA", "cases": str(len(calls))}]
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config['COVID_API_URL'] = f"http://127.0.0.1:{server.server_port}/api"
+    covid_cache = SWRCache('covid', fetchCovidAPI, tempfile.mkdtemp(), prepare=prepareCovid, ttl=1, stale=60)
     
     print("-"*30) # cosmetic separator
 
-    # This code looks for "world data"
-    response = getCovidAPI()
-    print("World Totals")
-    world = response.json().get('world_total')  # turn response to json() so we can extract "world_total"
-    for key, value in world.items():  # this finds key, value pairs in country
-        print(key, value)
+    # This code looks for "world data", the first call fetches, the second is served from memory
+    for _ in range(2):
+        world = getCovidAPI().get('world_total')
+    print("World Totals", world, "upstream calls:", len(calls))
+
+    # After the ttl the stale copy is served while a background refresh runs
+    time.sleep(1.1)
+    print("Stale", getCovidAPI().get('world_total'))
+    time.sleep(0.5)
+    print("Refreshed", getCovidAPI().get('world_total'), "upstream calls:", len(calls))
 
     print("-"*30)
 
-    # This code looks for USA in "countries_stats"
-    country = getCountry("USA")
+    # This code looks for USA in "countries_stats", by ISO code
+    country = getCountry("us")
     print("USA Totals")
     for key, value in country.items():
         print(key, value)
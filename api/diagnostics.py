@@ -0,0 +1,104 @@
+import os
+import re
+import time
+import traceback
+from flask import request, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from __init__ import app
+from api.metrics import route  # same route labels as /metrics, the keys of SQL_QUERY_BUDGETS
+
+"""SQL diagnostics for development and load tests, off unless SQL_DIAGNOSTICS is set
+  -- slow queries: statements over SQL_SLOW_MS are logged with their parameters,
+     the view that ran them and the project line that issued them
+  -- N+1: a request that runs one statement shape more than SQL_REPEAT_LIMIT
+     times is logged with the line that issued it, e.g. a lazy relationship read in a loop
+  -- budgets: every response carries X-Query-Count, and X-Query-Budget when the
+     route has an entry in SQL_QUERY_BUDGETS; going over it is logged, so a test can
+     compare the two headers per endpoint
+"""
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARAMETERS_MAX = 500  # characters of bound parameters written to the log
+
+_placeholders = re.compile(r'\?(\s*,\s*\?)+')  # IN (?, ?, ?) lists of any length are one shape
+_space = re.compile(r'\s+')
+_enabled = False
+
+
+# statement text with whitespace and placeholder lists collapsed, parameters are already out of it
+def shape(statement):
+    return _placeholders.sub('?, ...', _space.sub(' ', statement)).strip()
+
+
+# innermost project line outside this module and the libraries, "model/users.py:250 in read"
+def caller():
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(PROJECT) and frame.filename != __file__ and '-packages' not in frame.filename:
+            return f"{os.path.relpath(frame.filename, PROJECT)}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+# "GET /api/users/ (user_api._read)" for requests, 'background' otherwise
+def view():
+    if not has_request_context():
+        return 'background'
+    return f"{request.method} {request.full_path.rstrip('?')} ({request.endpoint})"
+
+
+def start_request():
+    g.sql_queries = 0
+    g.sql_shapes = {}  # shape -> [count, caller of the first run]
+
+
+def finish_request(response):
+    count = g.pop('sql_queries', None)
+    if count is None:
+        return response
+    response.headers['X-Query-Count'] = str(count)
+    budget = app.config['SQL_QUERY_BUDGETS'].get(route())
+    if budget is not None:
+        response.headers['X-Query-Budget'] = str(budget)
+        if count > budget:
+            app.logger.warning("Query budget exceeded: %s ran %d statements, budget %d", view(), count, budget)
+    for statement, (repeats, origin) in g.pop('sql_shapes').items():
+        if repeats > app.config['SQL_REPEAT_LIMIT']:
+            app.logger.warning("Possible N+1: %s ran the same statement %d times from %s: %s",
+                               view(), repeats, origin, statement)
+    return response
+
+
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info['diagnostics_start'] = time.perf_counter()
+
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('diagnostics_start')
+    if elapsed * 1000 > app.config['SQL_SLOW_MS']:
+        app.logger.warning("Slow query %.1f ms in %s from %s: %s parameters %s", elapsed * 1000, view(), caller(),
+                           statement, repr(parameters)[:PARAMETERS_MAX])
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        key = shape(statement)
+        seen = g.sql_shapes.get(key)
+        if seen is None:
+            g.sql_shapes[key] = [1, caller()]  # the stack is only walked once per shape
+        else:
+            seen[0] += 1
+
+
+# Hooks the app and every engine, call before the first request is served
+def enable():
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    event.listen(Engine, "before_cursor_execute", start_query)
+    event.listen(Engine, "after_cursor_execute", record_query)
+
+
+if app.config['SQL_DIAGNOSTICS']:
+    enable()
@@ -3,6 +3,9 @@ from flask import Blueprint, request, jsonify
 from flask_restful import Api, Resource # used for REST API building
 
 from model.fridges import Fridge
+from api.listing import paginate
+from api.conditional import conditional
+from api.bulk import bulk_create, text_field
 
 fridge_api = Blueprint('fridge_api', __name__,
                    url_prefix='/api/fridges')
@@ -10,20 +13,34 @@ fridge_api = Blueprint('fridge_api', __name__,
 # API docs https://flask-restful.readthedocs.io/en/latest/api.html
 api = Api(fridge_api)
 
+"""Validate one item, shared by _Create and _Bulk
+Returns:
+    Tuple: (fields, None) when valid, (None, error message) otherwise
+"""
+def validate(body):
+    # validate recipename
+    recname, message = text_field(body, 'recname')
+    if message is not None:
+        return None, message
+    # validate recipelink
+    reclink, message = text_field(body, 'reclink')
+    if message is not None:
+        return None, message
+
+    return {'recname': recname, 'reclink': reclink}, None
+
+
 class FridgeAPI:        
     class _Create(Resource):
         def post(self):
             body = request.get_json()
             
             # error checking
-            # validate recipename
-            recname = body.get('recname')
-            if recname is None or len(recname) < 2:
-                return {'message': f'recname is missing, or is less than 2 characters'}, 400
-            # validate recipelink
-            reclink = body.get('reclink')
-            if reclink is None or len(reclink) < 2:
-                return {'message': f'reclink is missing, or is less than 2 characters'}, 400
+            fields, message = validate(body)
+            if message is not None:
+                return {'message': message}, 400
+            recname = fields['recname']
+            reclink = fields['reclink']
 
             # sets up the recipe in the database
             ro = Fridge(recname=recname, 
@@ -37,11 +54,16 @@ class FridgeAPI:
             # failure returns error
             return {'message': f'Error or User ID {recname} is duplicate'}, 400
 
+    class _Bulk(Resource):
+        def post(self):
+            ''' JSON array of fridge objects, valid items are inserted in one transaction '''
+            return bulk_create(Fridge, validate)
+
     class _Read(Resource):
+        @conditional(Fridge)
         def get(self):
-            fridges = Fridge.query.all()    # extracts all recipes from database
-            json_ready = [fridge.read() for fridge in fridges]  # prepares output in json
-            return jsonify(json_ready) 
+            # extracts one keyset page of recipes from database, prepared in json
+            return paginate(Fridge.query, Fridge)
     
             # deletes recipes from table
     class _Delete(Resource):
@@ -71,6 +93,7 @@ class FridgeAPI:
 
     # building RESTapi endpoint
     api.add_resource(_Create, '/create')
+    api.add_resource(_Bulk, '/bulk')
     api.add_resource(_Read, '/')
     api.add_resource(_Delete, '/delete')
     api.add_resource(_Security, '/authenticate')
\ No newline at end of file
@@ -1,9 +1,10 @@
-from flask import Blueprint, jsonify  # jsonify creates an endpoint response object
+from flask import Blueprint, jsonify, request, current_app  # jsonify creates an endpoint response object
 from flask_restful import Api, Resource # used for REST API building
 import requests  # used for testing 
 import random
 
 from model.jokes import *
+from api.listing import field_args
 
 joke_api = Blueprint('joke_api', __name__,
                    url_prefix='/api/jokes')
@@ -20,12 +21,23 @@ class JokesAPI:
     # getJokes()
     class _Read(Resource):
         def get(self):
-            return jsonify(getJokes())
+            # ?fields= keys of Joke.read(), the store returns whole jokes so they are picked here
+            try:
+                fields = field_args(JOKE_FIELDS)
+            except ValueError as e:
+                return {'message': str(e)}, 400
+            jokes = getJokes()
+            if fields is not None:
+                jokes = [{field: joke[field] for field in fields} for joke in jokes]
+            return jsonify(jokes)
 
     # getJoke(id)
     class _ReadID(Resource):
         def get(self, id):
-            return jsonify(getJoke(id))
+            joke = getJoke(id)
+            if joke is None:
+                return {'message': f'Joke {id} not found'}, 404
+            return jsonify(joke)
 
     # getRandomJoke()
     class _ReadRandom(Resource):
@@ -39,16 +51,32 @@ class JokesAPI:
             countMsg = {'count': count}
             return jsonify(countMsg)
 
+    # topJokes(by, n)
+    class _ReadTop(Resource):
+        def get(self):
+            by = request.args.get('by', 'haha')
+            if by not in COUNTERS:
+                return {'message': f'by must be one of {", ".join(COUNTERS)}'}, 400
+            try:
+                n = int(request.args.get('n', 10))
+            except ValueError:
+                return {'message': 'n must be an integer'}, 400
+            if n < 1:
+                return {'message': 'n must be at least 1'}, 400
+            return jsonify(topJokes(by, min(n, current_app.config['API_PAGE_SIZE_MAX'])))
+
     # put method: addJokeHaHa
     class _UpdateLike(Resource):
         def put(self, id):
-            addJokeHaHa(id)
+            if addJokeHaHa(id) is None:
+                return {'message': f'Joke {id} not found'}, 404
             return jsonify(getJoke(id))
 
     # put method: addJokeBooHoo
     class _UpdateJeer(Resource):
         def put(self, id):
-            addJokeBooHoo(id)
+            if addJokeBooHoo(id) is None:
+                return {'message': f'Joke {id} not found'}, 404
             return jsonify(getJoke(id))
 
     # building RESTapi resources/interfaces, these routes are added to Web Server
@@ -57,6 +85,7 @@ class JokesAPI:
     api.add_resource(_ReadID, '/<int:id>')
     api.add_resource(_ReadRandom, '/random')
     api.add_resource(_ReadCount, '/count')
+    api.add_resource(_ReadTop, '/top')
     api.add_resource(_UpdateLike, '/like/<int:id>')
     api.add_resource(_UpdateJeer, '/jeer/<int:id>')
     
@@ -0,0 +1,234 @@
+import json
+from urllib.parse import urlencode
+from flask import request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy import tuple_
+
+from api.serialize import serializer_for, compact_json
+
+"""Shared helpers for the collection (_Read) endpoints
+  Tables are walked with keyset pagination on id: ?limit=N&after=<id>
+  Each page costs one indexed range scan, no matter how big the table is.
+  Lists with a ?sort= use (sort value, id) as the keyset instead.
+  When more rows exist, the cursor for the next page is returned in the
+  X-Next-Cursor header and as a Link: <...>; rel="next" header, so the
+  body keeps the same JSON list shape clients already consume.
+
+  Exports that really need the whole table opt in to streaming with
+  ?stream=1 (a JSON array) or Accept: application/x-ndjson (one object
+  per line). Rows are fetched in batches of API_STREAM_BATCH with
+  yield_per, so memory is bounded by the batch and not the table.
+
+  Models with FIELDS are listed through api/serialize.py: only their
+  columns are selected and rows are encoded without ORM objects or read().
+  ?fields=id,name narrows the SELECT to the columns of those keys.
+"""
+
+NDJSON = 'application/x-ndjson'
+
+
+"""Query String Parser
+Returns:
+    Tuple: (limit, after) where after is the raw cursor, None on the first page
+Raises:
+    ValueError: message suitable for a 400 response
+"""
+def page_args():
+    default = current_app.config['API_PAGE_SIZE']
+    cap = current_app.config['API_PAGE_SIZE_MAX']
+
+    limit = request.args.get('limit', default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError(f'limit must be an integer, got {limit}')
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    limit = min(limit, cap)  # hard server side cap on page size
+
+    return limit, request.args.get('after')
+
+
+"""Sparse Fieldset Parser
+  ?fields=a,b picks read() keys, repeated keys are ignored
+  available: the keys a client may ask for
+Returns:
+    Tuple: requested keys, None when there is no ?fields=
+Raises:
+    ValueError: message suitable for a 400 response
+"""
+def field_args(available):
+    raw = request.args.get('fields')
+    if raw is None:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    if not fields:
+        raise ValueError('fields must name at least one field')
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f'unknown fields {", ".join(unknown)}, available fields are {", ".join(available)}')
+    return fields
+
+
+"""Keyset Ordering
+  Orders by id, or by (order, id) when a sort column is given, and starts after the cursor.
+  An id cursor is the last id; a sorted cursor is "<value>,<id>" of the last row.
+  Rows with a NULL sort value are left out of sorted listings.
+Returns:
+    Query: filtered and ordered
+Raises:
+    ValueError: message suitable for a 400 response
+"""
+def keyset(query, model, after, order=None, descending=False):
+    if order is None:
+        if after is not None:
+            try:
+                query = query.filter(model.id > int(after))
+            except ValueError:
+                raise ValueError(f'after must be an id, got {after}')
+        return query.order_by(model.id)
+
+    query = query.filter(order.isnot(None))
+    if after is not None:
+        try:
+            value, id = after.rsplit(',', 1)
+            cursor = tuple_(order.type.python_type(value), int(id))
+        except ValueError:
+            raise ValueError(f'after must be a cursor from X-Next-Cursor, got {after}')
+        key = tuple_(order, model.id)
+        query = query.filter(key < cursor if descending else key > cursor)  # row value comparison, walks the index
+    if descending:
+        return query.order_by(order.desc(), model.id.desc())
+    return query.order_by(order, model.id)
+
+
+"""Cursor of a row, see keyset
+Returns:
+    String: value for after= that continues after this row
+"""
+def cursor_of(row, order=None):
+    if order is None:
+        return str(row.id)
+    return f'{getattr(row, order.key)},{row.id}'
+
+
+"""Next Page URL
+Returns:
+    String: current url with after/limit replaced
+"""
+def next_url(after, limit):
+    args = request.args.to_dict()
+    args['after'] = after
+    args['limit'] = limit
+    return request.base_url + '?' + urlencode(args)
+
+
+"""Streaming Mode
+Returns:
+    String: 'ndjson', 'json' or None when the client wants a normal page
+"""
+def stream_mode():
+    if request.accept_mimetypes.best == NDJSON:
+        return 'ndjson'
+    stream = request.args.get('stream', '').lower()
+    if stream == 'ndjson':
+        return 'ndjson'
+    if stream in ('1', 'true', 'json'):
+        return 'json'
+    return None
+
+
+"""Selected Columns
+Returns:
+    List: the serializer's columns, plus the id and sort column the cursor is read from
+"""
+def selected(serializer, model, order=None):
+    columns = list(serializer.columns)
+    for column in (model.id, order):
+        if column is not None and not any(column.key == chosen.key for chosen in columns):
+            columns.append(column)
+    return columns
+
+
+"""Streamed Response
+  Iterates the query with server side batching and yields the encoded
+  rows as they are produced, ?after= is still honored as a start point.
+  serializer: optional RowSerializer, rows are then column tuples
+Returns:
+    Response: chunked JSON array or NDJSON body
+"""
+def stream(query, model, serialize, mode, order=None, descending=False, serializer=None):
+    try:
+        query = keyset(query, model, request.args.get('after'), order, descending)
+    except ValueError as e:
+        return {'message': str(e)}, 400
+    if serializer is not None:
+        query = query.with_entities(*selected(serializer, model, order))
+        encode = serializer.row
+    else:
+        def encode(row):
+            return json.dumps(serialize(row), separators=(',', ':'), sort_keys=True)
+    rows = query.yield_per(current_app.config['API_STREAM_BATCH'])
+
+    def generate_ndjson():
+        for row in rows:
+            yield encode(row) + '\n'
+
+    def generate_json():
+        yield '['
+        first = True
+        for row in rows:
+            yield encode(row) if first else ',' + encode(row)
+            first = False
+        yield ']\n'
+
+    if mode == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()), mimetype=NDJSON)
+    return Response(stream_with_context(generate_json()), mimetype='application/json')
+
+
+"""Keyset Paginated Response
+  query: SQLAlchemy query of model rows (filters may already be applied)
+  model: model class, its id column is the keyset
+  serialize: row -> dictionary, defaults to row.read(), or to the model's RowSerializer when it has FIELDS,
+             the caller then handles ?fields= itself
+  order: optional sort column, the keyset becomes (order, id), descending reverses it
+Returns:
+    Response: jsonify of the page (or a stream, see stream_mode),
+    or ({'message'}, 400) on bad arguments
+"""
+def paginate(query, model, serialize=None, order=None, descending=False):
+    serializer = None
+    if serialize is None and hasattr(model, 'FIELDS'):
+        try:
+            serializer = serializer_for(model, field_args(model.FIELDS))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+    if serialize is None:
+        serialize = lambda row: row.read()
+    mode = stream_mode()
+    if mode is not None:
+        return stream(query, model, serialize, mode, order, descending, serializer)
+
+    try:
+        limit, after = page_args()
+        query = keyset(query, model, after, order, descending)
+    except ValueError as e:
+        return {'message': str(e)}, 400
+
+    if serializer is not None:
+        query = query.with_entities(*selected(serializer, model, order))  # column tuples, no objects
+    rows = query.limit(limit + 1).all()  # one extra row tells us if there is a next page
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    if serializer is None:
+        response = jsonify([serialize(row) for row in rows])
+    elif compact_json():
+        response = current_app.response_class(serializer.rows(rows), mimetype=current_app.json.mimetype)
+    else:
+        response = jsonify([dict(zip(serializer.keys, row)) for row in rows])  # pretty printed
+    if more:
+        cursor = cursor_of(rows[-1], order)
+        response.headers['X-Next-Cursor'] = cursor
+        response.headers['Link'] = f'<{next_url(cursor, limit)}>; rel="next"'
+    return response
@@ -0,0 +1,127 @@
+import os
+import time
+from flask import Blueprint, Response, request, g, has_request_context
+from flask_restful import Api, Resource # used for REST API building
+from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+"""Request, SQL and upstream instrumentation, exposed at /metrics in Prometheus text format
+  Every request records its latency, status and body size by route, and the
+  number and time of the SQL statements it ran. Upstream HTTP calls record
+  their latency by service and outcome. The response cache counts its hits,
+  misses, stores and evictions.
+
+  Under gunicorn each worker keeps its own counters. With PROMETHEUS_MULTIPROC_DIR
+  set (see gunicorn.conf.py) they are written to files in that folder, and
+  /metrics adds up the files of every worker, whichever worker answers.
+"""
+
+# the folder must exist before the first value is recorded, also for commands like `manage.py seed` that run
+# before gunicorn's on_starting creates it
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+metrics_api = Blueprint('metrics_api', __name__)
+
+# API docs https://flask-restful.readthedocs.io/en/latest/api.html
+api = Api(metrics_api)
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = tuple(256 * 4 ** power for power in range(9))  # 256 B .. 16 MiB
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Time to build a response, by route',
+                            ['route', 'method'], buckets=LATENCY_BUCKETS)
+REQUESTS = Counter('http_requests', 'Responses by route and status', ['route', 'method', 'status'])
+RESPONSE_BYTES = Histogram('http_response_bytes', 'Response body size, streamed bodies are not counted',
+                           ['route'], buckets=BYTES_BUCKETS)
+REQUEST_QUERIES = Histogram('db_queries_per_request', 'SQL statements run by one request', ['route'],
+                            buckets=QUERIES_BUCKETS)
+QUERIES = Counter('db_queries', 'SQL statements, by route or "background" outside requests', ['route'])
+QUERY_SECONDS = Counter('db_query_seconds', 'Time spent in SQL statements, by route', ['route'])
+UPSTREAM_SECONDS = Histogram('upstream_request_duration_seconds', 'Outbound HTTP calls, by service and outcome',
+                             ['service', 'outcome'], buckets=LATENCY_BUCKETS + (30,))
+RESPONSE_CACHE = Counter('response_cache_events', 'Response cache hits, disk_hits, misses, stores, evictions '
+                         'and bodies skipped as too large', ['event'])
+
+
+# route template of the current request, bounded label values, 'unmatched' for 404s
+def route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+@metrics_api.before_app_request
+def start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_queries = 0
+
+
+@metrics_api.after_app_request
+def record_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    name = route()
+    REQUEST_SECONDS.labels(name, request.method).observe(time.perf_counter() - start)
+    REQUESTS.labels(name, request.method, str(response.status_code)).inc()
+    if not response.is_streamed:
+        RESPONSE_BYTES.labels(name).observe(response.calculate_content_length() or 0)
+    REQUEST_QUERIES.labels(name).observe(g.metrics_queries)
+    return response
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_start'] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('metrics_start')
+    name = route() if has_request_context() else 'background'  # streamed bodies still count for their route
+    QUERIES.labels(name).inc()
+    QUERY_SECONDS.labels(name).inc(elapsed)
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries += 1
+
+
+# ResponseCache record callback
+def cache_event(event):
+    RESPONSE_CACHE.labels(event).inc()
+
+
+"""Upstream Timer
+  Times an outbound call: with upstream('covid'): requests.get(...)
+  The outcome label is 'ok', or 'error' when the block raises
+"""
+class upstream:
+    def __init__(self, service):
+        self.service = service
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, error, traceback):
+        UPSTREAM_SECONDS.labels(self.service, 'ok' if kind is None else 'error').observe(time.perf_counter() - self.start)
+        return False
+
+
+# registry to expose, the files of all workers in multiprocess mode
+def registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+
+
+class MetricsAPI:
+    class _Read(Resource):
+        def get(self):
+            return Response(generate_latest(registry()), mimetype=CONTENT_TYPE_LATEST)
+
+    # building RESTapi endpoint
+    api.add_resource(_Read, '/metrics')
@@ -1,8 +1,11 @@
 import json
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_restful import Api, Resource # used for REST API building
 
-from model.nutritions import Nutrition
+from model.nutritions import Nutrition, NUTRIENTS, nutrition_table
+from api.listing import paginate
+from api.conditional import conditional
+from api.bulk import bulk_create, text_field
 
 nutrition_api = Blueprint('nutriton_api', __name__,
                    url_prefix='/api/nutriitons')
@@ -10,6 +13,58 @@ nutrition_api = Blueprint('nutriton_api', __name__,
 # API docs https://flask-restful.readthedocs.io/en/latest/api.html
 api = Api(nutrition_api)
 
+"""Validate one item, shared by _Create and _Bulk
+Returns:
+    Tuple: (fields, None) when valid, (None, error message) otherwise
+"""
+def validate(body):
+    # validate nutritionname
+    nutritionname, message = text_field(body, 'nutritionname')
+    if message is not None:
+        return None, message
+    # validate nutritioncalories
+    nutritioncalories, message = text_field(body, 'nutritioncalories')
+    if message is not None:
+        return None, message
+    # validate nutritionfat
+    nutritionfat, message = text_field(body, 'nutritionfat')
+    if message is not None:
+        return None, message
+    # validate nutritioncarbs
+    nutritioncarbs, message = text_field(body, 'nutritioncarbs')
+    if message is not None:
+        return None, message
+
+    return {'nutritionname': nutritionname, 'nutritioncalories': nutritioncalories, 'nutritionfat': nutritionfat, 'nutritioncarbs': nutritioncarbs}, None
+
+
+"""Meal Plan Parser
+  A plan is a list of items, {"name": "Apple", "quantity": 2}, {"id": 3, "quantity": 0.5} or ["Apple", 2]
+Returns:
+    Tuple: (list of (name or id, quantity), None), or (None, error message)
+"""
+def plan_items(plan):
+    if isinstance(plan, dict):
+        plan = plan.get('items')
+    if not isinstance(plan, list):
+        return None, 'a plan must be a list of items'
+    items = []
+    for index, item in enumerate(plan):
+        if isinstance(item, dict):
+            key = item.get('id', item.get('name'))
+            quantity = item.get('quantity', 1)
+        elif isinstance(item, list) and len(item) == 2:
+            key, quantity = item
+        else:
+            return None, f'item {index} must be an object or a [name, quantity] pair'
+        if key is None or isinstance(key, bool) or not isinstance(key, (int, str)):
+            return None, f'item {index} needs a name or an id'
+        if isinstance(quantity, bool) or not isinstance(quantity, (int, float)) or quantity < 0:
+            return None, f'item {index} quantity must be a number of servings, at least 0'
+        items.append((key, float(quantity)))
+    return items, None
+
+
 class RecipeAPI:        
     class _Create(Resource):
         def post(self):
@@ -17,22 +72,13 @@ class RecipeAPI:
             body = request.get_json()
             
             ''' Avoid garbage in, error checking '''
-            # validate nutritionname
-            nutritionname = body.get('nutritionname')
-            if nutritionname is None or len(nutritionname) < 2:
-                return {'message': f'nutritionname is missing, or is less than 2 characters'}, 400
-            # validate nutritioncalories
-            nutritioncalories = body.get('nutritioncalories')
-            if nutritioncalories is None or len(nutritioncalories) < 2:
-                return {'message': f'nutritioncalories is missing, or is less than 2 characters'}, 400
-            # validate nutritionfat
-            nutritionfat = body.get('nutritionfat')
-            if nutritionfat is None or len(nutritionfat) < 2:
-                return {'message': f'nutritionfat is missing, or is less than 2 characters'}, 400
-            # validate nutritioncarbs
-            nutritioncarbs = body.get('nutritioncarbs')
-            if nutritioncarbs is None or len(nutritioncarbs) < 2:
-                return {'message': f'nutritioncarbs is missing, or is less than 2 characters'}, 400
+            fields, message = validate(body)
+            if message is not None:
+                return {'message': message}, 400
+            nutritionname = fields['nutritionname']
+            nutritioncalories = fields['nutritioncalories']
+            nutritionfat = fields['nutritionfat']
+            nutritioncarbs = fields['nutritioncarbs']
 
             ''' #1: Key code block, setup USER OBJECT '''
             ro = Nutrition(nutritionname=nutritionname, 
@@ -49,13 +95,62 @@ class RecipeAPI:
             # failure returns error
             return {'message': f' User ID {nutritionname} is duplicate'}, 400
 
+    class _Bulk(Resource):
+        def post(self):
+            ''' JSON array of nutrition objects, valid items are inserted in one transaction '''
+            return bulk_create(Nutrition, validate)
+
     class _Read(Resource):
+        @conditional(Nutrition)
         def get(self):
-            nutritions = Nutrition.query.all()    # read/extract all users from database
-            json_ready = [nutrition.read() for nutrition in nutritions]  # prepare output in json
-            return jsonify(json_ready)  # jsonify creates Flask response object, more specific to APIs than json.dumps
+            # ?min_<nutrient>= / ?max_<nutrient>= range filters in canonical units (kcal, grams)
+            query = Nutrition.query
+            for name, column in NUTRIENTS.items():
+                for bound in ('min', 'max'):
+                    value = request.args.get(f'{bound}_{name}')
+                    if value is None:
+                        continue
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        return {'message': f'{bound}_{name} must be a number'}, 400
+                    query = query.filter(column >= value if bound == 'min' else column <= value)
+            # ?sort=<nutrient>, or ?sort=-<nutrient> for descending, pages stay keyset on (value, id)
+            sort = request.args.get('sort')
+            order, descending = None, False
+            if sort is not None:
+                descending = sort.startswith('-')
+                order = NUTRIENTS.get(sort.lstrip('-'))
+                if order is None:
+                    return {'message': f'sort must be one of {", ".join(NUTRIENTS)}, optionally prefixed with -'}, 400
+            # read/extract one keyset page of nutritions from database, prepared in json
+            return paginate(query, Nutrition, order=order, descending=descending)
     
 
+    class _Totals(Resource):
+        def post(self):
+            ''' {"items": [...]} for one plan, or {"plans": [...]} to evaluate many plans together '''
+            body = request.get_json(silent=True)
+            if not isinstance(body, dict) or ('items' in body) == ('plans' in body):
+                return {'message': 'body must have either items or plans'}, 400
+            single = 'items' in body
+            plans = [body['items']] if single else body['plans']
+            if not isinstance(plans, list):
+                return {'message': 'plans must be a list'}, 400
+            parsed = []
+            for index, plan in enumerate(plans):
+                items, message = plan_items(plan)
+                if message is not None:
+                    return {'message': message if single else f'plan {index}: {message}'}, 400
+                parsed.append(items)
+            if sum(len(items) for items in parsed) > current_app.config['API_BULK_MAX']:
+                return {'message': f'at most {current_app.config["API_BULK_MAX"]} items per request'}, 400
+
+            results = nutrition_table.totals(parsed)
+            return jsonify(results[0] if single else results)
+
     # building RESTapi endpoint
     api.add_resource(_Create, '/create')
-    api.add_resource(_Read, '/')
\ No newline at end of file
+    api.add_resource(_Bulk, '/bulk')
+    api.add_resource(_Read, '/')
+    api.add_resource(_Totals, '/totals')
\ No newline at end of file
@@ -3,6 +3,9 @@ from flask import Blueprint, request, jsonify
 from flask_restful import Api, Resource # used for REST API building
 
 from model.recipes import Recipe
+from api.listing import paginate
+from api.conditional import conditional
+from api.bulk import bulk_create, text_field
 
 recipe_api = Blueprint('recipe_api', __name__,
                    url_prefix='/api/recipes')
@@ -10,6 +13,42 @@ recipe_api = Blueprint('recipe_api', __name__,
 # API docs https://flask-restful.readthedocs.io/en/latest/api.html
 api = Api(recipe_api)
 
+"""Validate one item, shared by _Create and _Bulk
+Returns:
+    Tuple: (fields, None) when valid, (None, error message) otherwise
+"""
+def validate(body):
+    # validate recipename
+    recipename, message = text_field(body, 'recipename')
+    if message is not None:
+        return None, message
+    # validate recipelink
+    recipelink, message = text_field(body, 'recipelink')
+    if message is not None:
+        return None, message
+    # validate recipetype
+    recipetype, message = text_field(body, 'recipetype')
+    if message is not None:
+        return None, message
+    # validate recipecuisine
+    recipecuisine, message = text_field(body, 'recipecuisine')
+    if message is not None:
+        return None, message
+
+    return {'recipename': recipename, 'recipelink': recipelink, 'recipetype': recipetype, 'recipecuisine': recipecuisine}, None
+
+
+"""Filter Arguments
+  ?type= and ?cuisine= take one value or a comma separated list, matched case insensitively
+Returns:
+    Tuple: (types, cuisines) lists
+"""
+def filter_args():
+    def values(name):
+        return [value.strip() for value in request.args.get(name, '').split(',') if value.strip()]
+    return values('type'), values('cuisine')
+
+
 class RecipeAPI:        
     class _Create(Resource):
         def post(self):
@@ -17,22 +56,13 @@ class RecipeAPI:
             body = request.get_json()
             
             ''' Avoid garbage in, error checking '''
-            # validate recipename
-            recipename = body.get('recipename')
-            if recipename is None or len(recipename) < 2:
-                return {'message': f'recipename is missing, or is less than 2 characters'}, 400
-            # validate recipelink
-            recipelink = body.get('recipelink')
-            if recipelink is None or len(recipelink) < 2:
-                return {'message': f'recipelink is missing, or is less than 2 characters'}, 400
-            # validate recipetype
-            recipetype = body.get('recipetype')
-            if recipetype is None or len(recipetype) < 2:
-                return {'message': f'recipetype is missing, or is less than 2 characters'}, 400
-            # validate recipecuisine
-            recipecuisine = body.get('recipecuisine')
-            if recipecuisine is None or len(recipecuisine) < 2:
-                return {'message': f'recipetype is missing, or is less than 2 characters'}, 400
+            fields, message = validate(body)
+            if message is not None:
+                return {'message': message}, 400
+            recipename = fields['recipename']
+            recipelink = fields['recipelink']
+            recipetype = fields['recipetype']
+            recipecuisine = fields['recipecuisine']
 
             ''' #1: Key code block, setup USER OBJECT '''
             ro = Recipe(recipename=recipename, 
@@ -49,13 +79,28 @@ class RecipeAPI:
             # failure returns error
             return {'message': f'Processed {recipetype}, either a format error or User ID {recipename} is duplicate'}, 400
 
+    class _Bulk(Resource):
+        def post(self):
+            ''' JSON array of recipe objects, valid items are inserted in one transaction '''
+            return bulk_create(Recipe, validate)
+
     class _Read(Resource):
+        @conditional(Recipe)
+        def get(self):
+            # read/extract one keyset page of recipes from database, prepared in json
+            types, cuisines = filter_args()
+            return paginate(Recipe.filtered(Recipe.query, types, cuisines), Recipe)
+
+    class _Facets(Resource):
+        @conditional(Recipe)
         def get(self):
-            recipes = Recipe.query.all()    # read/extract all users from database
-            json_ready = [recipe.read() for recipe in recipes]  # prepare output in json
-            return jsonify(json_ready)  # jsonify creates Flask response object, more specific to APIs than json.dumps
+            # counts per type and cuisine, narrowed by the same filters as the list
+            types, cuisines = filter_args()
+            return jsonify(Recipe.facets(types, cuisines))
     
 
     # building RESTapi endpoint
     api.add_resource(_Create, '/create')
-    api.add_resource(_Read, '/')
\ No newline at end of file
+    api.add_resource(_Bulk, '/bulk')
+    api.add_resource(_Read, '/')
+    api.add_resource(_Facets, '/facets')
\ No newline at end of file
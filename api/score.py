@@ -1,9 +1,12 @@
 import json
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_restful import Api, Resource # used for REST API building
 
 # from model.users import User
 from model.scores import Score
+from api.listing import paginate
+from api.conditional import conditional
+from api.bulk import bulk_create, text_field
 from __init__ import db
 
 score_api = Blueprint('score_api', __name__,
@@ -12,6 +15,29 @@ score_api = Blueprint('score_api', __name__,
 # API docs https://flask-restful.readthedocs.io/en/latest/api.html
 api = Api(score_api)
 
+"""Validate one item, shared by _Create and _Bulk
+Returns:
+    Tuple: (fields, None) when valid, (None, error message) otherwise
+"""
+def validate(body):
+    # validate name
+    name, message = text_field(body, 'name')
+    if message is not None:
+        return None, message
+    # validate score, a whole number given as a number or a string
+    score = body.get('score')
+    if score is None or isinstance(score, bool):
+        return None, f'Score is missing'
+    try:
+        if isinstance(score, float) and not score.is_integer():
+            raise ValueError
+        score = int(score)
+    except (TypeError, ValueError):
+        return None, f'Score {score} is not a whole number'
+
+    return {'name': name, 'score': score}, None
+
+
 class ScoreAPI:        
     class _Create(Resource):
         def post(self):
@@ -19,14 +45,11 @@ class ScoreAPI:
             body = request.get_json()
             
             ''' Avoid garbage in, error checking '''
-            # validate name
-            name = body.get('name')
-            if name is None or len(name) < 2:
-                return {'message': f'Name is missing, or is less than 2 characters'}, 400
-            # validate score
-            score = body.get('score')
-            if score is None or len(score) < 1:
-                return {'message': f'Score is missing'}, 400
+            fields, message = validate(body)
+            if message is not None:
+                return {'message': message}, 400
+            name = fields['name']
+            score = fields['score']
 
             ''' #1: Key code block, setup USER OBJECT '''
             so = Score(name=name, 
@@ -42,12 +65,43 @@ class ScoreAPI:
             # failure returns error
             return {'message': f'Processed {name}, either a format error or User ID {score} is duplicate'}, 400
 
+    class _Bulk(Resource):
+        def post(self):
+            ''' JSON array of score objects, valid items are inserted in one transaction '''
+            return bulk_create(Score, validate)
+
     class _Read(Resource):
+        @conditional(Score)
         def get(self):
-            users = Score.query.all()    # read/extract all users from database
-            json_ready = [user.read() for user in users]  # prepare output in json
-            return jsonify(json_ready)  # jsonify creates Flask response object, more specific to APIs than json.dumps
+            # read/extract one keyset page of scores from database, prepared in json
+            return paginate(Score.query, Score)
     
+    class _ReadTop(Resource):
+        @conditional(Score)
+        def get(self):
+            # n best scores, one index walk of n entries
+            try:
+                n = int(request.args.get('n', 10))
+            except ValueError:
+                return {'message': 'n must be an integer'}, 400
+            if n < 1:
+                return {'message': 'n must be at least 1'}, 400
+            n = min(n, current_app.config['API_PAGE_SIZE_MAX'])
+            leaders = []
+            for position, score in enumerate(Score.top(n)):
+                # ties share the rank of the first player with that score
+                rank = leaders[-1]['rank'] if leaders and leaders[-1]['score'] == score.score else position + 1
+                leaders.append(dict(score.read(), rank=rank))
+            return jsonify(leaders)
+
+    class _ReadRank(Resource):
+        def get(self, name):
+            # player lookup on the unique name index, rank from an index range COUNT
+            score = Score.query.filter_by(_name=name).first()
+            if score is None:
+                return {'message': f'{name} not found'}, 404
+            return jsonify(dict(score.read(), rank=score.rank()))
+
     class _Delete(Resource):
         def delete(self):
             db.session.query(Score).delete()
@@ -57,5 +111,8 @@ class ScoreAPI:
 
     # building RESTapi endpoint
     api.add_resource(_Create, '/create')
+    api.add_resource(_Bulk, '/bulk')
     api.add_resource(_Read, '/')
+    api.add_resource(_ReadTop, '/top')
+    api.add_resource(_ReadRank, '/rank/<string:name>')
     api.add_resource(_Delete, '/delete')
\ No newline at end of file
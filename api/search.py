@@ -0,0 +1,42 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_restful import Api, Resource # used for REST API building
+
+from model.search import search, SEARCH_SOURCES
+from api.listing import next_url
+
+search_api = Blueprint('search_api', __name__,
+                   url_prefix='/api/search')
+
+# API docs https://flask-restful.readthedocs.io/en/latest/api.html
+api = Api(search_api)
+
+class SearchAPI:
+    class _Read(Resource):
+        def get(self):
+            ''' Read query arguments '''
+            q = request.args.get('q', '').strip()
+            if len(q) < 1:
+                return {'message': 'q is missing'}, 400
+            kinds = [kind for kind in request.args.get('kind', '').split(',') if kind]
+            unknown = [kind for kind in kinds if kind not in SEARCH_SOURCES]
+            if unknown:
+                return {'message': f'kind must be one of {", ".join(SEARCH_SOURCES)}'}, 400
+            try:
+                limit = min(int(request.args.get('limit', 20)), current_app.config['API_PAGE_SIZE_MAX'])
+                offset = int(request.args.get('after', 0))  # position in the ranking, from X-Next-Cursor
+            except ValueError:
+                return {'message': 'limit and after must be integers'}, 400
+            if limit < 1 or offset < 0:
+                return {'message': 'limit must be at least 1 and after at least 0'}, 400
+
+            ''' Ranked matches, one extra row tells us if there is a next page '''
+            results = search(q, kinds, limit + 1, offset)
+            response = jsonify(results[:limit])
+            if len(results) > limit:
+                cursor = offset + limit
+                response.headers['X-Next-Cursor'] = str(cursor)
+                response.headers['Link'] = f'<{next_url(cursor, limit)}>; rel="next"'
+            return response
+
+    # building RESTapi endpoint
+    api.add_resource(_Read, '', '/')
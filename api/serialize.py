@@ -0,0 +1,88 @@
+from json.encoder import encode_basestring_ascii
+from flask import current_app
+from sqlalchemy import Integer, String
+
+from __init__ import app
+
+"""Row serializers for the list endpoints
+  A model with a FIELDS mapping (read() key -> column) can be listed without
+  building ORM objects: the endpoint selects just those columns and a
+  serializer built once per model turns each row tuple straight into
+  JSON text. The output is the same text jsonify gives for read(), keys
+  sorted, compact separators, non ASCII escaped, and a trailing newline
+  after the list.
+"""
+
+
+# JSON text of a value, the same as the app's jsonify for plain values
+def _value(value):
+    return app.json.dumps(value)
+
+
+def _string(value):
+    return encode_basestring_ascii(value) if value.__class__ is str else _value(value)
+
+
+def _integer(value):
+    return int.__repr__(value) if value.__class__ is int else _value(value)
+
+
+# JSON encoder for the values of a column, anything other than the expected type goes through dumps
+def _encoder(column):
+    if isinstance(column.type, String):
+        return _string
+    if isinstance(column.type, Integer):
+        return _integer
+    return _value
+
+
+# Serializer for rows selected as tuple(FIELDS.values())
+# -- parts is built once: (quoted key and colon, value encoder, position in the row), in jsonify's sorted key order
+class RowSerializer:
+    def __init__(self, fields):
+        self.keys = list(fields)
+        self.columns = list(fields.values())
+        ordered = sorted(range(len(self.keys)), key=lambda i: self.keys[i])  # jsonify sorts keys
+        self.parts = [(encode_basestring_ascii(self.keys[i]) + ':', _encoder(self.columns[i]), i) for i in ordered]
+        parts = self.parts
+
+        # JSON text of one row
+        def row(row):
+            return '{' + ','.join([key + encode(row[i]) for key, encode, i in parts]) + '}'
+        self.row = row
+
+    # JSON text of a list of rows, as jsonify([...]) would build it
+    def rows(self, rows):
+        return '[' + ','.join(map(self.row, rows)) + ']\n'
+
+
+_serializers = {}
+
+
+"""Serializer Lookup
+  fields: optional subset of model.FIELDS keys, from ?fields=
+Returns:
+    RowSerializer: for those FIELDS, built on first use
+"""
+def serializer_for(model, fields=None):
+    key = (model, tuple(sorted(fields)) if fields else None)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        chosen = model.FIELDS if fields is None else {field: model.FIELDS[field] for field in key[1]}
+        serializer = _serializers[key] = RowSerializer(chosen)
+    return serializer
+
+
+"""Compact Check
+Returns:
+    Boolean: True when jsonify writes sorted, compact, ASCII JSON, the only format RowSerializer produces
+"""
+def compact_json():
+    provider = current_app.json
+    compact = getattr(provider, 'compact', None)
+    pretty = current_app.config.get('JSONIFY_PRETTYPRINT_REGULAR')
+    if pretty is not None:
+        compact = not pretty
+    if compact is False or (compact is None and current_app.debug):
+        return False
+    return getattr(provider, 'sort_keys', False) and getattr(provider, 'ensure_ascii', False)
@@ -1,9 +1,16 @@
 import json
-from flask import Blueprint, request, jsonify
+import os
+from flask import Blueprint, request, jsonify, send_from_directory, abort
 from flask_restful import Api, Resource # used for REST API building
+from flask_login import login_required, current_user
+from werkzeug.security import safe_join
 from datetime import datetime
 
-from model.users import User
+from __init__ import app
+from model.users import User, Post, image_hash
+from api.listing import paginate, field_args
+from api.conditional import conditional
+from api.auth import issue_token, check_password
 
 user_api = Blueprint('user_api', __name__,
                    url_prefix='/api/users')
@@ -31,13 +38,12 @@ class UserAPI:
             dob = body.get('dob')
 
             ''' #1: Key code block, setup USER OBJECT '''
+            # password is hashed once, by the constructor, the default applies when none is given
             uo = User(name=name, 
-                      uid=uid)
+                      uid=uid,
+                      **({'password': password} if password is not None else {}))
             
             ''' Additional garbage error checking '''
-            # set password if provided
-            if password is not None:
-                uo.set_password(password)
             # convert to date type
             if dob is not None:
                 try:
@@ -55,10 +61,21 @@ class UserAPI:
             return {'message': f'Processed {name}, either a format error or User ID {uid} is duplicate'}, 400
 
     class _Read(Resource):
+        @conditional(User, Post)
         def get(self):
-            users = User.query.all()    # read/extract all users from database
-            json_ready = [user.read() for user in users]  # prepare output in json
-            return jsonify(json_ready)  # jsonify creates Flask response object, more specific to APIs than json.dumps
+            # ?posts= chooses full posts, summaries, a count or nothing, see User.POST_MODES
+            posts = request.args.get('posts', 'full')
+            if posts not in User.POST_MODES:
+                return {'message': f'posts must be one of {", ".join(User.POST_MODES)}'}, 400
+            # ?fields= keys of User.READ_COLUMNS, only their columns are selected
+            try:
+                fields = field_args(User.READ_COLUMNS)
+            except ValueError as e:
+                return {'message': str(e)}, 400
+            # read/extract one keyset page of users and their posts in a constant number of queries
+            query = User.query.options(*User.posts_options(posts, fields=fields))
+            inline = request.args.get('inline', '').lower() in ('1', 'true')  # legacy base64 images
+            return paginate(query, User, lambda user: user.read(posts=posts, inline=inline, fields=fields))
     
     class _Security(Resource):
 
@@ -73,12 +90,37 @@ class UserAPI:
             password = body.get('password')
             
             ''' Find user '''
-            user = User.query.filter_by(_uid=uid).first()
-            if user is None or not user.is_password(password):
+            user = User.query.options(*User.posts_options(many=False)).filter_by(_uid=uid).first()
+            if user is None:
+                return {'message': f"Invalid user id or password"}, 400
+            # always the password, a token is never enough to get a new one, so tokens still expire
+            valid = check_password(user, password)
+            if valid is None:
+                return {'message': 'Too many logins in progress, try again shortly'}, 503
+            if not valid:
                 return {'message': f"Invalid user id or password"}, 400
             
-            ''' authenticated user '''
-            return jsonify(user.read())
+            ''' authenticated user, with a fresh token for the following requests '''
+            inline = request.args.get('inline', '').lower() in ('1', 'true')  # legacy base64 images
+            return jsonify(dict(user.read(inline=inline), token=issue_token(user)))
+
+    class _Me(Resource):
+        method_decorators = [login_required]
+
+        def get(self):
+            ''' The signed in user, read from the Bearer token without touching the database '''
+            return jsonify(current_user.read())
+
+    class _Image(Resource):
+        def get(self, filename):
+            ''' Stream a post image, sendfile under gunicorn, with ETag and Range support '''
+            folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+            if safe_join(folder, filename) is None:  # no escaping the upload folder
+                abort(404)
+            digest = image_hash(filename)
+            if digest is None:
+                abort(404)
+            return send_from_directory(folder, filename, etag=digest, max_age=3600)
 
             
 
@@ -86,4 +128,6 @@ class UserAPI:
     api.add_resource(_Create, '/create')
     api.add_resource(_Read, '/')
     api.add_resource(_Security, '/authenticate')
+    api.add_resource(_Me, '/me')
+    api.add_resource(_Image, '/images/<path:filename>')
     
\ No newline at end of file
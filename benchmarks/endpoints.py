@@ -0,0 +1,286 @@
+""" API benchmark suite, every blueprint through the Flask test client and through gunicorn
+  Run from the project root:
+    python -m benchmarks.endpoints [--rows 1k|100k|1M] [--mode client|gunicorn|both] [--requests 200]
+                                   [--out results.json] [--baseline baseline.json]
+  A fresh database file gets --rows users, recipes, fridges, nutritions and scores from model/generate.py
+  (as `python manage.py generate` makes them), and covid data comes from a local stand-in server,
+  so nothing leaves the machine.
+  Each endpoint reports requests per second, p50/p99 latency and peak RSS; results are written as JSON,
+  and a --baseline from an earlier run is compared endpoint by endpoint (exit status 1 on a regression).
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+folder = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, folder, True)
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(folder, 'bench.db')  # before the app binds its engine
+os.environ['COVID_CACHE_FOLDER'] = folder + '/'
+
+PASSWORD = 'bench'
+# name -> (method, path, json body), strings may use the {uid} and {player} names from seed()
+ENDPOINTS = {
+    'users': ('GET', '/api/users/?limit=100', None),
+    'users_count': ('GET', '/api/users/?limit=100&posts=count', None),
+    'users_fields': ('GET', '/api/users/?limit=100&fields=id,name', None),
+    'authenticate': ('POST', '/api/users/authenticate', {'uid': '{uid}', 'password': PASSWORD}),
+    'recipes': ('GET', '/api/recipes/?limit=100', None),
+    'recipes_filtered': ('GET', '/api/recipes/?limit=100&type=dinner&cuisine=italian', None),
+    'recipe_facets': ('GET', '/api/recipes/facets', None),
+    'fridges': ('GET', '/api/fridges/?limit=100', None),
+    'nutritions': ('GET', '/api/nutriitons/?limit=100', None),
+    'nutritions_sorted': ('GET', '/api/nutriitons/?limit=100&sort=-calories&max_fat=10', None),
+    'nutrition_totals': ('POST', '/api/nutriitons/totals', {'items': [[1, 2], [2, 0.5], [3, 1]]}),
+    'scores': ('GET', '/api/scores/?limit=100', None),
+    'scores_top': ('GET', '/api/scores/top?n=10', None),
+    'score_rank': ('GET', '/api/scores/rank/{player}', None),
+    'jokes': ('GET', '/api/jokes/', None),
+    'jokes_top': ('GET', '/api/jokes/top?n=5', None),
+    'search': ('GET', '/api/search?q=pasta&limit=20', None),
+    'covid': ('GET', '/api/covid/', None),
+    'covid_country': ('GET', '/api/covid/usa', None),
+}
+
+SIZES = {'k': 1000, 'm': 1000000}
+
+
+def rows_arg(text):
+    text = text.strip().lower()
+    if text[-1:] in SIZES:
+        return int(float(text[:-1]) * SIZES[text[-1]])
+    return int(text)
+
+
+"""Covid stand-in
+  Serves a payload shaped like RapidAPI's, with a couple of hundred countries
+"""
+def covid_stand_in():
+    countries = [{"country_name": "USA", "cases": "1,000,000"}] + \
+                [{"country_name": f"Country {i}", "cases": f"{i * 1000:,}"} for i in range(200)]
+    body = json.dumps({"world_total": {"total_cases": "2,000,000"}, "countries_stat": countries}).encode()
+
+    class StandIn(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/api"
+
+
+"""Seed
+  count rows per table from the synthetic data generator, the same data on every run
+Returns:
+    Dictionary: names the endpoint paths and bodies refer to, a user's uid and a player's name
+"""
+def seed(count):
+    from main import app, db, generateData  # every model and blueprint, so initSchema sees all tables
+    from model.schema import initSchema
+    from model.jokes import initJokes
+    from model.users import User
+    from model.scores import Score
+
+    initSchema()
+    initJokes()
+    generateData(users=count, recipes=count, fridges=count, nutritions=count, scores=count, password=PASSWORD, seed=0)
+    with app.app_context():
+        uid = db.session.execute(db.select(User._uid).order_by(User.id).limit(1)).scalar()
+        player = db.session.execute(db.select(Score._name).order_by(Score.id.desc()).limit(1)).scalar()
+    return {'uid': uid, 'player': player}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary(latencies, wall, errors, rss_mb):
+    return {'requests': len(latencies), 'errors': errors, 'rps': round(len(latencies) / wall, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3), 'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3), 'peak_rss_mb': round(rss_mb, 1)}
+
+
+"""Flask test client, one request at a time in this process """
+def run_client(endpoints, requests_per, warmup):
+    from main import app
+    client = app.test_client()
+    results = {}
+    for name, (method, path, body) in endpoints.items():
+        for _ in range(warmup):
+            client.open(path, method=method, json=body)
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        for _ in range(requests_per):
+            began = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            latencies.append(time.perf_counter() - began)
+            errors += response.status_code >= 400
+        wall = time.perf_counter() - start
+        results[name] = summary(latencies, wall, errors, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+        print_row('client', name, results[name])
+    return results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# peak resident memory of gunicorn's workers, from /proc (Linux)
+def workers_rss_mb(master):
+    peak = 0
+    try:
+        with open(f'/proc/{master}/task/{master}/children') as f:
+            children = f.read().split()
+    except OSError:
+        return 0
+    for pid in children:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        peak = max(peak, int(line.split()[1]) / 1024)
+        except OSError:
+            pass
+    return peak
+
+
+"""gunicorn workers, driven by a pool of concurrent clients """
+def run_gunicorn(endpoints, requests_per, warmup, workers, concurrency):
+    import requests
+    port = free_port()
+    env = dict(os.environ, GUNICORN_CMD_ARGS='')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+                               '--log-level', 'warning', 'main:app'], env=env)
+    base = f'http://127.0.0.1:{port}'
+    local = threading.local()
+
+    def call(method, path, body):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        began = time.perf_counter()
+        response = local.session.request(method, base + path, json=body)
+        return time.perf_counter() - began, response.status_code >= 400
+
+    try:
+        for _ in range(100):
+            try:
+                requests.get(base + '/api/jokes/count', timeout=5)
+                break
+            except requests.RequestException:  # refused until bound, timed out while workers import
+                time.sleep(0.2)
+        results = {}
+        with ThreadPoolExecutor(concurrency) as pool:
+            for name, (method, path, body) in endpoints.items():
+                list(pool.map(lambda _: call(method, path, body), range(warmup)))
+                start = time.perf_counter()
+                timings = list(pool.map(lambda _: call(method, path, body), range(requests_per)))
+                wall = time.perf_counter() - start
+                results[name] = summary([latency for latency, _ in timings], wall,
+                                        sum(error for _, error in timings), workers_rss_mb(server.pid))
+                print_row('gunicorn', name, results[name])
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_row(mode, name, result):
+    print(f"{mode:<10}{name:<20}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+          f"{result['peak_rss_mb']:>10.1f}{result['errors']:>8}")
+
+
+"""Baseline comparison
+  A regression is throughput down, or p99 latency up, by more than tolerance
+Returns:
+    List: (mode, endpoint, description) of regressions
+"""
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"\n{'mode':<10}{'endpoint':<20}{'rps':>12}{'p99':>12}")
+    for mode, endpoints in results.items():
+        for name, current in endpoints.items():
+            before = baseline.get('results', {}).get(mode, {}).get(name)
+            if before is None:
+                continue
+            rps = current['rps'] / before['rps'] if before['rps'] else 1
+            p99 = current['p99_ms'] / before['p99_ms'] if before['p99_ms'] else 1
+            flag = ''
+            if rps < 1 - tolerance or p99 > 1 + tolerance:
+                flag = '  REGRESSION'
+                regressions.append((mode, name, f'rps x{rps:.2f}, p99 x{p99:.2f}'))
+            print(f"{mode:<10}{name:<20}{rps:>11.2f}x{p99:>11.2f}x{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=rows_arg, default='1k', help='rows per table, e.g. 1k, 100k, 1M')
+    parser.add_argument('--mode', choices=('client', 'gunicorn', 'both'), default='client')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=3, help='gunicorn workers')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients against gunicorn')
+    parser.add_argument('--only', help='comma separated endpoint names')
+    parser.add_argument('--no-response-cache', action='store_true', help='measure the endpoints, not the response cache')
+    parser.add_argument('--out', help='write results as JSON')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    os.environ['COVID_API_URL'] = covid_stand_in()
+    if args.no_response_cache:
+        os.environ['RESPONSE_CACHE_BYTES'] = '0'
+    started = time.perf_counter()
+    names = seed(args.rows)
+    endpoints = {name: (method, path.format(**names),
+                        body if not isinstance(body, dict) else
+                        {key: value.format(**names) if isinstance(value, str) else value for key, value in body.items()})
+                 for name, (method, path, body) in ENDPOINTS.items() if not args.only or name in args.only.split(',')}
+    print(f"Seeded {args.rows} rows per table in {time.perf_counter() - started:.1f}s")
+    print(f"{'mode':<10}{'endpoint':<20}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'rss MB':>10}{'errors':>8}")
+
+    results = {}
+    if args.mode in ('client', 'both'):
+        results['client'] = run_client(endpoints, args.requests, args.warmup)
+    if args.mode in ('gunicorn', 'both'):
+        results['gunicorn'] = run_gunicorn(endpoints, args.requests, args.warmup, args.workers, args.concurrency)
+
+    report = {
+        'meta': {'rows': args.rows, 'requests': args.requests, 'workers': args.workers, 'concurrency': args.concurrency,
+                 'response_cache': not args.no_response_cache, 'python': platform.python_version(),
+                 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')},
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}")
+            sys.exit(1)
@@ -0,0 +1,64 @@
+""" List serialization benchmark, ORM objects + read() + jsonify against column rows + RowSerializer
+  Run from the project root:  python -m benchmarks.serialize [--rows 20000] [--limit 1000] [--repeat 20]
+  Each model with FIELDS gets a table of generated rows in a fresh database file; a page of
+  --limit rows is listed through api.listing.paginate both ways and the bodies are compared byte for byte.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+folder = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(folder, 'bench.db')  # before the app binds its engine
+
+from sqlalchemy import insert
+
+from __init__ import app, db
+from model.recipes import Recipe
+from model.fridges import Fridge
+from model.nutritions import Nutrition
+from model.scores import Score
+from api.listing import paginate
+
+NAMES = ['Pasta', 'Crème brûlée', 'Tom "yum" soup', 'Phở', 'Back\\slash', 'Jollof rice']
+
+
+def generate(model, count):
+    if model is Recipe:
+        return [{'_recipename': f'{NAMES[i % 6]} {i}', '_recipelink': f'https://example.com/r/{i}',
+                 '_recipetype': ('lunch', 'dinner', 'dessert')[i % 3], '_recipecuisine': 'Fusion'} for i in range(count)]
+    if model is Fridge:
+        return [{'_recname': f'{NAMES[i % 6]} {i}', '_reclink': f'https://example.com/f/{i}'} for i in range(count)]
+    if model is Nutrition:
+        return [{'_nutritionname': f'{NAMES[i % 6]} {i}', '_nutritioncalories': f'{i % 900} kcal',
+                 '_nutritionfat': f'{i % 40}.5 g', '_nutritioncarbs': f'{i % 70} g'} for i in range(count)]
+    return [{'_name': f'player {i}', '_score': (i * 7919) % 100000} for i in range(count)]
+
+
+def timed(model, serialize, limit, repeat):
+    with app.test_request_context(f'/?limit={limit}'):
+        body = paginate(model.query, model, serialize).get_data()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            paginate(model.query, model, serialize).get_data()
+        return body, (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    app.config['API_PAGE_SIZE_MAX'] = max(app.config['API_PAGE_SIZE_MAX'], args.limit)
+
+    print(f"{args.rows} rows per table, pages of {args.limit}, mean of {args.repeat} runs")
+    print(f"{'model':<12}{'orm ms':>10}{'fields ms':>12}{'speedup':>10}{'identical':>12}")
+    with app.app_context():
+        db.create_all()
+        for model in (Recipe, Fridge, Nutrition, Score):
+            db.session.execute(insert(model.__table__), generate(model, args.rows))
+            db.session.commit()
+            orm_body, orm = timed(model, lambda row: row.read(), args.limit, args.repeat)
+            fast_body, fast = timed(model, None, args.limit, args.repeat)
+            print(f"{model.__name__:<12}{orm * 1000:>10.2f}{fast * 1000:>12.2f}{orm / fast:>9.1f}x{str(orm_body == fast_body):>12}")
@@ -0,0 +1,104 @@
+""" SQLite engine profile benchmark
+  Run from the project root:  python -m benchmarks.sqlite_profile [--workers 3] [--seconds 5]
+  Each profile in SQLITE_PROFILES gets a fresh database file shared by several processes,
+  the way gunicorn workers share volumes/sqlite.db:
+  -- write: every worker inserts one row per transaction, like Model.create()
+  -- read: every worker pages through the table, like the keyset _Read endpoints, while one writer runs
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from __init__ import app, SQLITE_PROFILES
+
+SEED_ROWS = 20000
+PAGE = 100
+
+
+def engine_for(path, profile):
+    app.config['SQLITE_PRAGMAS'] = SQLITE_PROFILES[profile]  # the app's connect listener applies it
+    return create_engine('sqlite:///' + path)
+
+
+def writer(path, profile, seconds, results):
+    engine = engine_for(path, profile)
+    done = locked = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("INSERT INTO bench (name, value) VALUES (:n, :v)"),
+                             {'n': 'row', 'v': random.random()})
+            done += 1
+        except OperationalError:  # "database is locked"
+            locked += 1
+    results.put(('write', done, locked))
+
+
+def reader(path, profile, seconds, results):
+    engine = engine_for(path, profile)
+    done = locked = 0
+    deadline = time.time() + seconds
+    with engine.connect() as conn:
+        while time.time() < deadline:
+            try:
+                after = random.randrange(SEED_ROWS)
+                conn.execute(text("SELECT * FROM bench WHERE id > :a ORDER BY id LIMIT :l"),
+                             {'a': after, 'l': PAGE}).fetchall()
+                conn.rollback()  # end the read transaction so WAL checkpoints can progress
+                done += 1
+            except OperationalError:
+                locked += 1
+    results.put(('read', done, locked))
+
+
+def run(jobs, seconds):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=target, args=args + (seconds, results)) for target, args in jobs]
+    for process in processes:
+        process.start()
+    totals = {}
+    for _ in processes:
+        kind, done, locked = results.get()
+        total = totals.setdefault(kind, [0, 0])
+        total[0] += done
+        total[1] += locked
+    for process in processes:
+        process.join()
+    return {kind: (done / seconds, locked) for kind, (done, locked) in totals.items()}
+
+
+def bench(profile, workers, seconds):
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'bench.db')
+    engine = engine_for(path, profile)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE bench (id INTEGER PRIMARY KEY, name VARCHAR(255), value FLOAT)"))
+        conn.execute(text("INSERT INTO bench (name, value) VALUES (:n, :v)"),
+                     [{'n': 'seed', 'v': i} for i in range(SEED_ROWS)])
+    engine.dispose()
+
+    write = run([(writer, (path, profile))] * workers, seconds)
+    read = run([(reader, (path, profile))] * workers + [(writer, (path, profile))], seconds)
+    return write['write'], read['read'], read['write']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.seconds}s per phase")
+    print(f"{'profile':<12}{'writes/s':>12}{'locked':>8}{'reads/s':>12}{'locked':>8}{'writes/s':>12}")
+    print(f"{'':<12}{'(writers only)':>20}{'(readers + 1 writer)':>40}")
+    for profile in SQLITE_PROFILES:
+        (writes, write_locked), (reads, read_locked), (mixed_writes, _) = bench(profile, args.workers, args.seconds)
+        print(f"{profile:<12}{writes:>12.0f}{write_locked:>8}{reads:>12.0f}{read_locked:>8}{mixed_writes:>12.0f}")
@@ -0,0 +1,20 @@
+""" gunicorn settings, read automatically when gunicorn starts in this folder """
+import glob
+import os
+
+
+# Prometheus multiprocess mode, each worker writes its metrics to files in this folder (see api/metrics.py)
+# -- files left by a previous run are removed before any worker starts
+def on_starting(server):
+    folder = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+        for path in glob.glob(os.path.join(folder, '*.db')):
+            os.remove(path)
+
+
+# a dead worker's live gauges are dropped, its counters and histograms stay in the totals
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
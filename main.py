@@ -1,4 +1,6 @@
 import threading
+import time
+import click
 # import "packages" from flask
 from flask import render_template, request  # import render_template from "public" flask libraries
 import sqlite3
@@ -10,7 +12,9 @@ from model.users import initUsers
 from model.scores import initScores
 from model.recipes import initRecipes
 from model.fridges import initFridges
-from model.nutritions import initNutrition
+from model.nutritions import initNutrition, backfillNutrition
+from model.schema import initSchema
+from model.generate import generateData, POST_DISTRIBUTIONS
 
 
 # setup APIs
@@ -21,6 +25,10 @@ from api.score import score_api
 from api.recipe import recipe_api
 from api.fridge import fridge_api
 from api.nutrition import nutrition_api
+from api.search import search_api
+from api.cache import cache_api
+from api.metrics import metrics_api
+import api.diagnostics  # SQL diagnostics hooks, when SQL_DIAGNOSTICS is set
 
  
 # setup App pages
@@ -35,6 +43,9 @@ app.register_blueprint(score_api)
 app.register_blueprint(recipe_api)
 app.register_blueprint(fridge_api)
 app.register_blueprint(nutrition_api)
+app.register_blueprint(search_api)
+app.register_blueprint(cache_api)
+app.register_blueprint(metrics_api)
 
 
 @app.errorhandler(404)  # catch for URL not found
@@ -50,9 +61,52 @@ def index():
 def stub():
     return render_template("stub.html")
 
-@app.before_first_request
-def activate_job():
-    db.init_app(app)
+# Schema and seed data are built ahead of serving, `python manage.py init-db` or `python manage.py seed` before gunicorn starts
+@app.cli.command('init-db')
+def init_db():
+    """Create missing tables and indexes."""
+    initSchema()
+    print("Database schema is ready")
+
+@app.cli.command('seed')
+def seed():
+    """Create the schema and load tester data into empty tables."""
+    initSchema()
+    seedData()
+    print("Database is seeded")
+
+@app.cli.command('backfill-nutrition')
+@click.option('--chunk', default=500, help='Rows updated per transaction.')
+@click.option('--pause', default=0.05, help='Seconds between chunks, room for request writers.')
+def backfill_nutrition(chunk, pause):
+    """Fill numeric nutrition columns from the text columns, safe on a live table."""
+    initSchema()
+    print(f"Backfilled {backfillNutrition(chunk, pause)} nutrition rows")
+
+@app.cli.command('generate')
+@click.option('--users', default=1000, help='Users to add.')
+@click.option('--posts-per-user', default=2.0, help='Mean posts per user.')
+@click.option('--posts-distribution', type=click.Choice(POST_DISTRIBUTIONS), default='geometric',
+              help='fixed, uniform 0..2*mean, or geometric (long tail).')
+@click.option('--recipes', default=1000, help='Recipes to add.')
+@click.option('--fridges', default=1000, help='Fridge entries to add.')
+@click.option('--nutritions', default=1000, help='Nutrition rows to add.')
+@click.option('--scores', default=1000, help='Scores to add.')
+@click.option('--password', default='123qwerty', help='Password of every generated user.')
+@click.option('--seed', default=0, help='Random seed, the same seed gives the same data.')
+def generate(users, posts_per_user, posts_distribution, recipes, fridges, nutritions, scores, password, seed):
+    """Create the schema and append seeded synthetic data for load tests."""
+    initSchema()
+    started = time.perf_counter()
+    inserted = generateData(users=users, recipes=recipes, fridges=fridges, nutritions=nutritions, scores=scores,
+                            posts_per_user=posts_per_user, posts_distribution=posts_distribution,
+                            password=password, seed=seed)
+    elapsed = time.perf_counter() - started
+    total = sum(inserted.values())
+    print(", ".join(f"{count} {table.strip()}" for table, count in inserted.items()))
+    print(f"Generated {total} rows in {elapsed:.1f}s, {total / elapsed:,.0f} rows/s")
+
+def seedData():
     initJokes()
     initUsers()
     initScores()
@@ -66,4 +120,6 @@ if __name__ == "__main__":
     # change name for testing
     from flask_cors import CORS
     cors = CORS(app)
+    initSchema()
+    seedData()
     app.run(debug=True, host="0.0.0.0", port="8086")
\ No newline at end of file
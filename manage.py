@@ -0,0 +1,13 @@
+from flask.cli import FlaskGroup
+
+from main import app
+
+"""
+Command line entry for the app, e.g. `python manage.py seed`
+  The project root holds __init__.py, so `flask` would import main as part of a package;
+  this script imports main the same way gunicorn does and exposes app.cli commands.
+"""
+cli = FlaskGroup(create_app=lambda: app)
+
+if __name__ == "__main__":
+    cli()
@@ -23,6 +23,9 @@ class Fridge(db.Model):
     _recname = db.Column(db.String(255), unique=False, nullable=False)
     _reclink = db.Column(db.String(255), unique=False, nullable=False)
 
+    # read() keys and the columns behind them, lets list endpoints serialize rows without building objects
+    FIELDS = {'id': id, 'recname': _recname, 'reclink': _reclink}
+
 
 
     # initializes the instance variables within object (self)
@@ -93,10 +96,11 @@ class Fridge(db.Model):
 
 
 # Builds working data for testing
+# -- runs from `python manage.py seed`, one transaction for the table, skipped when fridges already exist
 def initFridges():
     with app.app_context():
-        """Create database and tables"""
-        db.create_all()
+        if Fridge.query.first() is not None:
+            return  # already seeded
         """Tester data for table"""
         r1 = Fridge(recname='Baked Feta Pasta', reclink='https://www.foodnetwork.com/recipes/food-network-kitchen/baked-feta-pasta-9867689')
         r2 = Fridge(recname='Kale Salad', reclink='https://www.loveandlemons.com/kale-salad/')
@@ -111,10 +115,10 @@ def initFridges():
     
         fridges = [r1, r2, r3, r4, r5, r6, r7, r8, r9, r10]
 
-        # creates sample table of data
-        for fridge in fridges:
-            try:
-                fridge.create()
-            except IntegrityError:
-                db.session.remove()
-                print(f"Records exist, duplicate email, or error: {fridge.model}")
\ No newline at end of file
+        try:
+            db.session.add_all(fridges)
+            db.session.commit()
+        except IntegrityError:
+            '''fails with bad or duplicate data'''
+            db.session.rollback()
+            print("Records exist, duplicate name, or error seeding fridges")
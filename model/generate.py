@@ -0,0 +1,208 @@
+""" seeded synthetic data at any size, for load tests and benchmarks """
+import math
+import random
+import time
+from datetime import date
+from itertools import islice
+
+from __init__ import app, db
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+
+from model.users import User, Post
+from model.recipes import Recipe
+from model.fridges import Fridge
+from model.nutritions import Nutrition
+from model.scores import Score
+from model.versions import TableVersion, initVersions
+from model.search import SEARCH_SOURCES, SEARCH_TABLE, initSearch
+
+
+FIRST_NAMES = ('Ada', 'Alan', 'Grace', 'Linus', 'Margaret', 'Dennis', 'Barbara', 'Ken', 'Frances', 'Tim',
+               'Katherine', 'John', 'Radia', 'Edsger', 'Hedy', 'Donald', 'Shafi', 'Niklaus', 'Sophie', 'Guido')
+LAST_NAMES = ('Lovelace', 'Turing', 'Hopper', 'Torvalds', 'Hamilton', 'Ritchie', 'Liskov', 'Thompson', 'Allen',
+              'Berners-Lee', 'Johnson', 'Backus', 'Perlman', 'Dijkstra', 'Lamarr', 'Knuth', 'Goldwasser', 'Wirth')
+# (name, weight), roughly how often each shows up in real recipe sites
+RECIPE_TYPES = (('Breakfast', 2), ('Lunch', 3), ('Dinner', 4), ('Dessert', 2))
+CUISINES = (('American', 5), ('Italian', 4), ('Mexican', 3), ('Indian', 3), ('French', 2), ('Chinese', 3),
+            ('Japanese', 2), ('Mediterranean', 2), ('German', 1), ('Thai', 2))
+DISHES = ('Pasta', 'Lasagna', 'Salad', 'Soup', 'Pancakes', 'Omelette', 'Tacos', 'Curry', 'Stir Fry', 'Risotto',
+          'Sandwich', 'Burrito', 'Ramen', 'Pie', 'Brownies', 'Cookies', 'Pudding', 'Toast', 'Chili', 'Dumplings')
+ADJECTIVES = ('Classic', 'Spicy', 'Smoky', 'Creamy', 'Crispy', 'Quick', 'Roasted', 'Garlic', 'Lemon', 'Herbed',
+              'Vegan', 'Cheesy', 'Honey', 'Grilled', 'Easy')
+FOODS = ('Apple', 'Flour', 'Orange', 'Milk', 'Egg', 'Rice', 'Oats', 'Banana', 'Butter', 'Chicken', 'Salmon',
+         'Tofu', 'Almonds', 'Yogurt', 'Cheddar', 'Lentils', 'Spinach', 'Potato', 'Bread', 'Avocado')
+# string formats found in the hand written seed data, the API accepts all of them
+ENERGY_FORMATS = ('{:.0f} cal', '{:.2f} kcal', ' {:.2f} kcal', '{:.1f} kcal')
+MASS_FORMATS = ('{:.2f}g', '{:.2f} g', ' {:.2f} g', '{:.1f} g')
+POST_DISTRIBUTIONS = ('fixed', 'uniform', 'geometric')
+
+GENERATE_BATCH = 10000  # rows per executemany
+
+
+# Weighted choice of names, k at a time, from (name, weight) pairs
+def _weighted(rng, pairs, k):
+    names, weights = zip(*pairs)
+    return rng.choices(names, weights, k=k)
+
+
+"""Posts Per User
+  fixed: every user has mean posts; uniform: 0 .. 2 * mean; geometric: most users post
+  little and a few post a lot, with the same mean
+Returns:
+    Integer: posts for one user
+"""
+def posts_for(rng, mean, distribution):
+    if distribution == 'fixed':
+        return round(mean)
+    if distribution == 'uniform':
+        return int(rng.random() * (round(2 * mean) + 1))
+    if mean <= 0:
+        return 0
+    # inverse transform sampling, failures before the first success with p = 1 / (mean + 1)
+    return int(math.log(1.0 - rng.random()) / math.log(mean / (mean + 1)))
+
+
+# Row generators, one tuple per row in column order
+# -- picks index with int(random() * len), a C call, rng.choice costs several Python calls per pick
+
+
+# users rows, their posts are appended to posts as each user is generated
+def _users(rng, first_id, count, password, posts_mean, distribution, posts):
+    random, firsts, lasts = rng.random, FIRST_NAMES, LAST_NAMES
+    epoch, span = date(1950, 1, 1).toordinal(), (date(2010, 12, 31) - date(1950, 1, 1)).days
+    for id in range(first_id, first_id + count):
+        first, last = firsts[int(random() * len(firsts))], lasts[int(random() * len(lasts))]
+        name = f'{first} {last}'
+        for num in range(posts_for(rng, posts_mean, distribution)):
+            posts.append((f'#### {name} note {num}. \n Generated by test data.', 'ncs_logo.png', id))
+        yield id, name, f'{first.lower()}{id}', password, date.fromordinal(epoch + int(random() * span)).isoformat()
+
+
+def _recipes(rng, first_id, count):
+    random, adjectives, dishes = rng.random, ADJECTIVES, DISHES
+    types, cuisines = _weighted(rng, RECIPE_TYPES, count), _weighted(rng, CUISINES, count)
+    for offset, id in enumerate(range(first_id, first_id + count)):
+        yield (id, f'{adjectives[int(random() * len(adjectives))]} {dishes[int(random() * len(dishes))]}',
+               f'https://example.com/recipes/{id}', types[offset], cuisines[offset])
+
+
+def _fridges(rng, first_id, count):
+    random, adjectives, dishes = rng.random, ADJECTIVES, DISHES
+    for id in range(first_id, first_id + count):
+        yield (id, f'{adjectives[int(random() * len(adjectives))]} {dishes[int(random() * len(dishes))]}',
+               f'https://example.com/recipes/{int(random() * 10 * count) + 1}')
+
+
+# one quantity as (text, canonical value), text in one of formats, value as parse_quantity reads it back
+def _quantity(random, formats, value):
+    number = formats[int(random() * len(formats))]
+    text = number.format(value)
+    return text, float(text.split()[0].rstrip('gcal'))
+
+
+def _nutritions(rng, first_id, count):
+    random, expovariate, foods = rng.random, rng.expovariate, FOODS
+    for id in range(first_id, first_id + count):
+        calories, calories_value = _quantity(random, ENERGY_FORMATS, 5 + random() * 895)
+        fat, fat_value = _quantity(random, MASS_FORMATS, expovariate(1 / 8))
+        carbs, carbs_value = _quantity(random, MASS_FORMATS, random() * 100)
+        yield (id, f'{foods[int(random() * len(foods))]} {id}', calories, fat, carbs,
+               calories_value, fat_value, carbs_value)
+
+
+def _scores(rng, first_id, count):
+    random, paretovariate, names = rng.random, rng.paretovariate, FIRST_NAMES
+    for id in range(first_id, first_id + count):
+        # long tail, most players score low
+        yield id, f'{names[int(random() * len(names))]} {id}', int(paretovariate(1.5) * 10)
+
+
+# Inserts rows with executemany straight on the DB-API cursor, batch at a time, only one batch is held in memory
+# -- after: called once each batch is in, e.g. to insert the posts of a batch of users
+# returns number of rows inserted
+def _insert(connection, model, columns, rows, batch, after=None):
+    statement = (f'INSERT INTO "{model.__tablename__}" ({", ".join(columns)}) '
+                 f'VALUES ({", ".join("?" * len(columns))})')
+    rows, total = iter(rows), 0
+    while True:
+        chunk = list(islice(rows, batch))
+        if not chunk:
+            return total
+        connection.exec_driver_sql(statement, chunk)
+        total += len(chunk)
+        if after is not None:
+            after()
+
+
+def _next_id(connection, model):
+    return connection.execute(db.select(db.func.coalesce(db.func.max(model.id), 0))).scalar() + 1
+
+
+"""Generate Data
+  Appends synthetic rows to users (with posts), recipes, fridges, nutritions and scores.
+  The same seed and counts on the same starting tables give the same rows, apart from
+  the salt of the shared password hash; each table has its own random stream, so
+  changing one count leaves the other tables as they were.
+  All tables load in one transaction, DDL included, batches go to executemany without the ORM.
+  The non unique indexes are dropped for the load and built again at the end. The per
+  row version and search triggers are dropped too and put back by initVersions/initSearch
+  after it: versions go up once per table, and the search index gets the new names with
+  one INSERT ... SELECT.
+Returns:
+    Dictionary: table name -> rows inserted
+"""
+def generateData(users=1000, recipes=1000, fridges=1000, nutritions=1000, scores=1000, posts_per_user=2.0,
+                 posts_distribution='geometric', password='123qwerty', seed=0, batch=GENERATE_BATCH):
+    if posts_distribution not in POST_DISTRIBUTIONS:
+        raise ValueError(f'posts_distribution must be one of {", ".join(POST_DISTRIBUTIONS)}')
+    hashed = generate_password_hash(password, method='sha256')  # shared, hashing every user would dominate the load
+    # model, columns, row generator, count
+    tables = [
+        (User, ('id', '_name', '_uid', '_password', '_dob'),
+         lambda rng, first, count: _users(rng, first, count, hashed, posts_per_user, posts_distribution, post_rows), users),
+        (Recipe, ('id', '_recipename', '_recipelink', '_recipetype', '_recipecuisine'), _recipes, recipes),
+        (Fridge, ('id', '_recname', '_reclink'), _fridges, fridges),
+        (Nutrition, ('id', '_nutritionname', '_nutritioncalories', '_nutritionfat', '_nutritioncarbs',
+                     '_calories', '_fat', '_carbs'), _nutritions, nutritions),
+        (Score, ('id', '_name', '_score'), _scores, scores),
+    ]
+    post_rows = []  # posts of the users generated since the last batch
+    inserted = {Post.__tablename__: 0}
+    with app.app_context(), db.engine.begin() as connection:
+        # pysqlite only opens a transaction at the first INSERT, the DDL below must be part of it so a failed
+        # or interrupted load rolls back to the tables, triggers and indexes it started from
+        connection.exec_driver_sql('BEGIN')
+
+        def insert_posts():
+            inserted[Post.__tablename__] += _insert(connection, Post, ('note', 'image', 'userID'), post_rows, batch)
+            post_rows.clear()
+
+        triggers = connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars()
+        for name in [name for name in triggers if name.startswith(('version_', 'search_')) and name.endswith('_insert')]:
+            connection.exec_driver_sql(f'DROP TRIGGER "{name}"')
+        # secondary indexes are rebuilt with one sort each after the load, cheaper than a random B-tree insert per row
+        indexes = [index for model in (User, Post, Recipe, Fridge, Nutrition, Score) for index in model.__table__.indexes
+                   if not index.unique]
+        for index in indexes:
+            index.drop(connection, checkfirst=True)
+        first_ids = {}
+        for model, columns, generate, count in tables:
+            first_ids[model] = _next_id(connection, model)
+            rng = random.Random(f'{seed}:{model.__tablename__}')
+            inserted[model.__tablename__] = _insert(connection, model, columns, generate(rng, first_ids[model], count),
+                                                    batch, after=insert_posts if model is User else None)
+        for index in indexes:
+            index.create(connection)
+        for name, count in inserted.items():
+            connection.execute(TableVersion.__table__.update().where(TableVersion.name == name).values(
+                version=TableVersion.version + count, modified=time.time()))
+        if connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': SEARCH_TABLE}).first():
+            for kind, (model, column, offset) in SEARCH_SOURCES.items():
+                connection.execute(text(
+                    f'INSERT INTO {SEARCH_TABLE}(rowid, name, kind, ref) '
+                    f'SELECT id * 4 + {offset}, {column}, \'{kind}\', id FROM "{model.__tablename__}" WHERE id >= :first'),
+                    {'first': first_ids[model]})
+    initVersions()
+    initSearch()
+    return inserted
@@ -1,6 +1,12 @@
+""" joke data with like (haha) and jeer (boohoo) counters """
 import random
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+
+from __init__ import app, db
+from sqlalchemy import update, func
 
-jokes_data = []
 joke_list = [
     "If you give someone a program... you will frustrate them for a day; if you teach them how to program... you will "
     "frustrate them for a lifetime.",
@@ -24,63 +30,189 @@ joke_list = [
     'An SQL statement walks into a bar and sees two tables. It approaches, and asks may I join you?'
 ]
 
+# Define the Joke class to manage the 'jokes' table, counters live in SQL so every worker sees the same counts
+class Joke(db.Model):
+    __tablename__ = 'jokes'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # ids are positions in joke_list, starting at 0
+    joke = db.Column(db.Text, nullable=False)
+    haha = db.Column(db.Integer, nullable=False, default=0)
+    boohoo = db.Column(db.Integer, nullable=False, default=0)
+
+    # ranking indexes, kept up to date by SQLite on every UPDATE so top-k reads walk k index entries
+    __table_args__ = (
+        db.Index('ix_jokes_haha', haha.desc(), id),
+        db.Index('ix_jokes_boohoo', boohoo.desc(), id),
+    )
+
+    # returns dictionary
+    def read(self):
+        return {"id": self.id, "joke": self.joke, "haha": self.haha, "boohoo": self.boohoo}
+
+
+COUNTERS = ('haha', 'boohoo')
+JOKE_FIELDS = ('id', 'joke') + COUNTERS  # keys of read()
+
+
+# Joke store interface, the functions below delegate to the configured store
+# -- an id that is not a stored joke gives None from get and add, in every store
+class JokeStore(ABC):
+    @abstractmethod
+    def load(self, jokes):  # jokes is a list of dictionaries, ignored when jokes already exist
+        ...
+
+    @abstractmethod
+    def all(self):
+        ...
+
+    @abstractmethod
+    def get(self, id):  # the joke's dictionary, None for an unknown id
+        ...
+
+    @abstractmethod
+    def count(self):
+        ...
+
+    @abstractmethod
+    def add(self, id, counter):  # counter is 'haha' or 'boohoo', returns the new count, None for an unknown id
+        ...
+
+    @abstractmethod
+    def top(self, counter, n):  # n jokes with the highest counter, ties broken by id
+        ...
+
+
+# Per process store, counts are lost on restart and differ between workers
+# -- each counter has a ranking, a sorted list of (-count, id) updated on every add
+class MemoryJokeStore(JokeStore):
+    def __init__(self):
+        self.jokes = []
+        self.ranks = {counter: [] for counter in COUNTERS}
+        self._lock = threading.Lock()  # a rank is briefly one entry short while add moves it
+
+    def load(self, jokes):
+        with self._lock:
+            if self.jokes:
+                return False
+            self.jokes.extend(jokes)
+            for counter, rank in self.ranks.items():
+                rank.extend(sorted((-joke[counter], joke['id']) for joke in jokes))
+            return True
+
+    def all(self):
+        return self.jokes
+
+    def get(self, id):
+        return self.jokes[id] if 0 <= id < len(self.jokes) else None
+
+    def count(self):
+        return len(self.jokes)
+
+    def add(self, id, counter):
+        if not 0 <= id < len(self.jokes):
+            return None
+        rank = self.ranks[counter]
+        with self._lock:
+            entry = (-self.jokes[id][counter], id)
+            index = bisect_left(rank, entry)
+            assert rank[index] == entry, f'{counter} rank out of step with joke {id}'
+            del rank[index]
+            self.jokes[id][counter] = self.jokes[id][counter] + 1
+            insort(rank, (-self.jokes[id][counter], id))
+            return self.jokes[id][counter]
+
+    def top(self, counter, n):
+        with self._lock:
+            return [self.jokes[id] for _, id in self.ranks[counter][:n]]
+
+
+# SQL store, every like/jeer is a single atomic UPDATE ... SET haha = haha + 1
+class SQLJokeStore(JokeStore):
+    def load(self, jokes):
+        if Joke.query.first() is not None:
+            return False
+        db.session.add_all([Joke(**joke) for joke in jokes])
+        db.session.commit()
+        return True
+
+    def all(self):
+        return [joke.read() for joke in Joke.query.order_by(Joke.id)]
+
+    def get(self, id):
+        joke = db.session.get(Joke, id)
+        return joke.read() if joke else None
+
+    def count(self):
+        return db.session.query(func.count(Joke.id)).scalar()
+
+    def add(self, id, counter):
+        column = getattr(Joke, counter)
+        if db.session.execute(update(Joke).where(Joke.id == id).values({column: column + 1})).rowcount == 0:
+            db.session.rollback()
+            return None
+        value = db.session.query(column).filter(Joke.id == id).scalar()  # read inside the write transaction
+        db.session.commit()
+        return value
+
+    def top(self, counter, n):
+        column = getattr(Joke, counter)
+        return [joke.read() for joke in Joke.query.order_by(column.desc(), Joke.id).limit(n)]
+
+
+JOKE_STORES = {'memory': MemoryJokeStore, 'sql': SQLJokeStore}
+store = JOKE_STORES[app.config['JOKE_STORE']]()
+
+
 # Initialize jokes
+# -- runs from `python manage.py seed` for the SQL store, skipped when jokes already exist
 def initJokes():
-    # setup jokes into a dictionary with id, joke, haha, boohoo
-    item_id = 0
-    for item in joke_list:
-        jokes_data.append({"id": item_id, "joke": item, "haha": 0, "boohoo": 0})
-        item_id += 1
-    # prime some haha responses
-    for i in range(10):
-        id = getRandomJoke()['id']
-        addJokeHaHa(id)
-    # prime some haha responses
-    for i in range(5):
-        id = getRandomJoke()['id']
-        addJokeBooHoo(id)
+    with app.app_context():
+        # setup jokes into a dictionary with id, joke, haha, boohoo
+        jokes = [{"id": item_id, "joke": item, "haha": 0, "boohoo": 0} for item_id, item in enumerate(joke_list)]
+        if not store.load(jokes):
+            return  # jokes and their counts are already stored
+        # prime some haha responses
+        for i in range(10):
+            id = getRandomJoke()['id']
+            addJokeHaHa(id)
+        # prime some haha responses
+        for i in range(5):
+            id = getRandomJoke()['id']
+            addJokeBooHoo(id)
         
-# Return all jokes from jokes_data
+# Return all jokes
 def getJokes():
-    return(jokes_data)
+    return store.all()
 
 # Joke getter
 def getJoke(id):
-    return(jokes_data[id])
+    return store.get(id)
 
-# Return random joke from jokes_data
+# Return random joke
 def getRandomJoke():
-    return(random.choice(jokes_data))
+    return getJoke(random.randrange(countJokes()))
 
-# Liked joke
+# Leaderboard, n jokes with the most haha (or boohoo)
+def topJokes(counter='haha', n=10):
+    return store.top(counter, n)
+
+# Liked joke, None until some joke has a haha
 def favoriteJoke():
-    best = 0
-    bestID = -1
-    for joke in getJokes():
-        if joke['haha'] > best:
-            best = joke['haha']
-            bestID = joke['id']
-    return jokes_data[bestID]
+    best = topJokes('haha', 1)
+    return best[0] if best and best[0]['haha'] > 0 else None
     
-# Jeered joke
+# Jeered joke, None until some joke has a boohoo
 def jeeredJoke():
-    worst = 0
-    worstID = -1
-    for joke in getJokes():
-        if joke['boohoo'] > worst:
-            worst = joke['boohoo']
-            worstID = joke['id']
-    return jokes_data[worstID]
+    worst = topJokes('boohoo', 1)
+    return worst[0] if worst and worst[0]['boohoo'] > 0 else None
 
 # Add to haha for requested id
 def addJokeHaHa(id):
-    jokes_data[id]['haha'] = jokes_data[id]['haha'] + 1
-    return jokes_data[id]['haha']
+    return store.add(id, 'haha')
 
 # Add to boohoo for requested id
 def addJokeBooHoo(id):
-    jokes_data[id]['boohoo'] = jokes_data[id]['boohoo'] + 1
-    return jokes_data[id]['boohoo']
+    return store.add(id, 'boohoo')
 
 # Pretty Print joke
 def printJoke(joke):
@@ -88,11 +220,18 @@ def printJoke(joke):
 
 # Number of jokes
 def countJokes():
-    return len(jokes_data)
+    return store.count()
+
+# A memory store lives and dies with its worker, so it is filled when the module loads
+if isinstance(store, MemoryJokeStore):
+    initJokes()
 
 # Test Joke Model
 if __name__ == "__main__": 
+    from model.schema import initSchema
+    initSchema()
     initJokes()  # initialize jokes
+    app.app_context().push()
     
     # Most likes and most jeered
     best = favoriteJoke()
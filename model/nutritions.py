@@ -2,14 +2,41 @@
 from random import randrange
 import os, base64
 import json
+import re
+import threading
+import time
+
+import numpy as np
 
 from __init__ import app, db
+from sqlalchemy import update, bindparam
 from sqlalchemy.exc import IntegrityError
 
+from model.versions import TableVersion
+
 
 ''' Tutorial: https://www.sqlalchemy.org/library.html#tutorials, try to get into Python shell and follow along '''
 
 
+# Unit conversion to the canonical units, kcal for energy and grams for fat and carbs
+# -- the free text columns hold values like '94 cal', ' 1.23 g' and '455.00 kcal'
+ENERGY_UNITS = {'': 1, 'cal': 1, 'cals': 1, 'kcal': 1, 'kcals': 1, 'calories': 1, 'kj': 1 / 4.184}
+MASS_UNITS = {'': 1, 'g': 1, 'gram': 1, 'grams': 1, 'mg': 0.001, 'kg': 1000}
+QUANTITY = re.compile(r'^\s*([0-9]*\.?[0-9]+)\s*([a-zA-Z]*)\s*$')
+
+
+# Parses a quantity string into a number in canonical units
+# returns float, or None when the text is not a known format
+def parse_quantity(text, units):
+    match = QUANTITY.match(text or '')
+    if match is None:
+        return None
+    factor = units.get(match.group(2).lower())
+    if factor is None:
+        return None
+    return round(float(match.group(1)) * factor, 4)
+
+
 # Define the Recipe class to manage actions in the 'recipes' table
 # -- Object Relational Mapping (ORM) is the key concept of SQLAlchemy
 # -- a.) db.Model is like an inner layer of the onion in ORM
@@ -24,15 +51,30 @@ class Nutrition(db.Model):
     _nutritioncalories = db.Column(db.String(255), unique=False, nullable=False)
     _nutritionfat = db.Column(db.String(255), unique=False, nullable=False)
     _nutritioncarbs = db.Column(db.String(255), unique=False, nullable=False)
+    # Numeric copies of the text columns in canonical units, None when the text could not be parsed
+    _calories = db.Column(db.Float, nullable=True)  # kcal
+    _fat = db.Column(db.Float, nullable=True)  # grams
+    _carbs = db.Column(db.Float, nullable=True)  # grams
+
+    # Range filters and ?sort= walk these indexes, each one is ordered by (value, id)
+    __table_args__ = (
+        db.Index('ix_nutritions_calories', _calories),
+        db.Index('ix_nutritions_fat', _fat),
+        db.Index('ix_nutritions_carbs', _carbs),
+    )
+
+    # read() keys and the columns behind them, lets list endpoints serialize rows without building objects
+    FIELDS = {'id': id, 'nutritionname': _nutritionname, 'nutritioncalories': _nutritioncalories,
+              'nutritionfat': _nutritionfat, 'nutritioncarbs': _nutritioncarbs}
 
     # Defines a relationship between Recipe record and Notes table, one-to-many (one recipe to many notes)
 
     # constructor of a User object, initializes the instance variables within object (self)
     def __init__(self, nutritionname, nutritioncalories,nutritionfat, nutritioncarbs):
         self._nutritionname = nutritionname    # variables with self prefix become part of the object, 
-        self._nutritioncalories = nutritioncalories
-        self._nutritionfat = nutritionfat
-        self._nutritioncarbs = nutritioncarbs
+        self.nutritioncalories = nutritioncalories
+        self.nutritionfat = nutritionfat
+        self.nutritioncarbs = nutritioncarbs
 
     # a name getter method, extracts name from object
     @property
@@ -49,8 +91,9 @@ class Nutrition(db.Model):
         return self._nutritioncalories
     # a setter function, allows link to be updated after initial object creation
     @nutritioncalories.setter
-    def recipelink(self, nutritioncalories):
+    def nutritioncalories(self, nutritioncalories):
         self._nutritioncalories = nutritioncalories
+        self._calories = parse_quantity(nutritioncalories, ENERGY_UNITS)
         
     # a getter method, extracts link from object
     @property
@@ -58,8 +101,9 @@ class Nutrition(db.Model):
         return self._nutritionfat
     # a setter function, allows link to be updated after initial object creation
     @nutritionfat.setter
-    def recipetype(self, nutritionfat):
+    def nutritionfat(self, nutritionfat):
         self._nutritionfat = nutritionfat
+        self._fat = parse_quantity(nutritionfat, MASS_UNITS)
 
     # a getter method, extracts link from object
     @property
@@ -67,8 +111,9 @@ class Nutrition(db.Model):
         return self._nutritioncarbs
     # a setter function, allows link to be updated after initial object creation
     @nutritioncarbs.setter
-    def recipecuisine(self, nutritioncarbs):
+    def nutritioncarbs(self, nutritioncarbs):
         self._nutritioncarbs = nutritioncarbs
+        self._carbs = parse_quantity(nutritioncarbs, MASS_UNITS)
         
     
     @property
@@ -122,14 +167,125 @@ class Nutrition(db.Model):
         return None
 
 
+# Numeric columns by the names used in query strings, ?min_calories= / ?max_fat= / ?sort=carbs
+NUTRIENTS = {'calories': Nutrition._calories, 'fat': Nutrition._fat, 'carbs': Nutrition._carbs}
+
+
+"""Column Oriented Cache """
+
+
+# Nutrition table held as NumPy arrays for vectorized meal totals
+# -- values is an (rows, 3) float array of calories, fat, carbs, NaN where the text did not parse
+# -- rebuilt lazily when the table version moves, whichever worker changed a row
+class NutritionTable:
+    def __init__(self):
+        self._data = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    # one primary key lookup per call, the arrays are only reloaded after a change
+    def data(self):
+        versions, _ = TableVersion.of([Nutrition.__tablename__])
+        version = versions.get(Nutrition.__tablename__)
+        if self._data is None or self._version != version:
+            with self._lock:
+                if self._data is None or self._version != version:  # another thread may have reloaded while we waited
+                    self._data = self._load()
+                    self._version = version
+        return self._data
+
+    def _load(self):
+        rows = db.session.execute(db.select(
+            Nutrition.id, Nutrition._nutritionname, Nutrition._calories, Nutrition._fat, Nutrition._carbs
+        ).order_by(Nutrition.id)).all()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        names = [row[1] for row in rows]
+        values = np.array([row[2:] for row in rows], dtype=np.float64).reshape(len(rows), 3)  # None -> NaN
+        by_id = {int(id): index for index, id in enumerate(ids)}
+        by_name = {}
+        for index, name in enumerate(names):
+            by_name.setdefault(name.strip().lower(), index)  # first (lowest id) wins on duplicate names
+        return {'ids': ids, 'names': names, 'values': values, 'by_id': by_id, 'by_name': by_name}
+
+    # Totals for many meal plans at once
+    # plans: list of plans, each a list of (name or id, quantity) pairs, quantity in servings
+    # returns list of {'items', 'totals', 'errors'} dictionaries, one per plan
+    def totals(self, plans):
+        data = self.data()
+        rows, quantities, owners, errors = [], [], [], [[] for _ in plans]
+        for plan_index, plan in enumerate(plans):
+            for item_index, (key, quantity) in enumerate(plan):
+                index = data['by_id'].get(key) if isinstance(key, int) else data['by_name'].get(str(key).strip().lower())
+                if index is None:
+                    errors[plan_index].append({'index': item_index, 'message': f'{key} not found'})
+                    continue
+                rows.append(index)
+                quantities.append(quantity)
+                owners.append(plan_index)
+
+        # one gather and one multiply for every item of every plan, then per plan sums
+        rows = np.array(rows, dtype=np.int64)
+        owners = np.array(owners, dtype=np.int64)
+        amounts = data['values'][rows] * np.array(quantities, dtype=np.float64)[:, None]
+        known = np.nan_to_num(amounts)
+        totals = np.stack([np.bincount(owners, weights=known[:, k], minlength=len(plans)) for k in range(3)], axis=1)
+        missing = np.bincount(owners, weights=np.isnan(amounts).any(axis=1), minlength=len(plans))
+
+        results = [{'items': [], 'totals': dict(zip(NUTRIENTS, np.round(totals[p], 4).tolist())),
+                    'incomplete': int(missing[p]), 'errors': errors[p]} for p in range(len(plans))]
+        for position, (index, owner) in enumerate(zip(rows.tolist(), owners.tolist())):
+            item = {'id': int(data['ids'][index]), 'nutritionname': data['names'][index], 'quantity': quantities[position]}
+            for name, value in zip(NUTRIENTS, amounts[position].tolist()):
+                item[name] = None if value != value else round(value, 4)  # NaN when the text did not parse
+            results[owner]['items'].append(item)
+        return results
+
+
+nutrition_table = NutritionTable()
+
+
+"""Online Migration """
+
+
+# Fills the numeric columns of rows written before they existed, or by code that only set the text
+# -- works through the table by id in chunks, each chunk is one short write transaction,
+#    and pauses between chunks so request writers are never locked out for long
+# returns number of rows updated
+def backfillNutrition(chunk=500, pause=0.05):
+    table = Nutrition.__table__
+    with app.app_context():
+        statement = update(table).where(table.c.id == bindparam('row_id')).values(
+            _calories=bindparam('calories'), _fat=bindparam('fat'), _carbs=bindparam('carbs'))
+        updated = 0
+        after = 0
+        while True:
+            rows = db.session.execute(
+                db.select(table.c.id, table.c._nutritioncalories, table.c._nutritionfat, table.c._nutritioncarbs)
+                .where(table.c.id > after)
+                .where((table.c._calories == None) | (table.c._fat == None) | (table.c._carbs == None))
+                .order_by(table.c.id).limit(chunk)).all()
+            if not rows:
+                return updated
+            values = [{'row_id': id,
+                       'calories': parse_quantity(calories, ENERGY_UNITS),
+                       'fat': parse_quantity(fat, MASS_UNITS),
+                       'carbs': parse_quantity(carbs, MASS_UNITS)} for id, calories, fat, carbs in rows]
+            db.session.execute(statement, values)  # executemany, one transaction per chunk
+            db.session.commit()
+            updated += len(rows)
+            after = rows[-1][0]
+            time.sleep(pause)
+
+
 """Database Creation and Testing """
 
 
 # Builds working data for testing
+# -- runs from `python manage.py seed`, one transaction for the table, skipped when nutritions already exist
 def initNutrition():
     with app.app_context():
-        """Create database and tables"""
-        db.create_all()
+        if Nutrition.query.first() is not None:
+            return  # already seeded
         """Tester data for table"""
         r1 = Nutrition(nutritionname='Apple', nutritioncalories='94 cal', nutritionfat='0.31g', nutritioncarbs='20.77 g')
         r2 = Nutrition(nutritionname='Flour', nutritioncalories='455.00 kcal', nutritionfat=' 1.23 g', nutritioncarbs='92.01 g')
@@ -140,11 +296,10 @@ def initNutrition():
     
         nutritions = [r1, r2, r3, r4, r5]
 
-        """Builds sample user/note(s) data"""
-        for nutrition in nutritions:
-            try:
-                nutrition.create()
-            except IntegrityError:
-                '''fails with bad or duplicate data'''
-                db.session.remove()
-                print(f"Records exist, duplicate email, or error: {nutrition.model}")
\ No newline at end of file
+        try:
+            db.session.add_all(nutritions)
+            db.session.commit()
+        except IntegrityError:
+            '''fails with bad or duplicate data'''
+            db.session.rollback()
+            print("Records exist, duplicate name, or error seeding nutritions")
@@ -4,6 +4,7 @@ import os, base64
 import json
 
 from __init__ import app, db
+from sqlalchemy import collate, func
 from sqlalchemy.exc import IntegrityError
 
 
@@ -25,6 +26,19 @@ class Recipe(db.Model):
     _recipetype = db.Column(db.String(255), unique=False, nullable=False)
     _recipecuisine = db.Column(db.String(255), unique=False, nullable=False)
 
+    # Case insensitive indexes for ?type= / ?cuisine= filtering and facet counts
+    # -- single column indexes keep matching rows in id order for keyset pages
+    # -- the composite index covers type + cuisine filters and the facet GROUP BY
+    __table_args__ = (
+        db.Index('ix_recipes_type', collate(_recipetype, 'NOCASE')),
+        db.Index('ix_recipes_cuisine', collate(_recipecuisine, 'NOCASE')),
+        db.Index('ix_recipes_type_cuisine', collate(_recipetype, 'NOCASE'), collate(_recipecuisine, 'NOCASE')),
+    )
+
+    # read() keys and the columns behind them, lets list endpoints serialize rows without building objects
+    FIELDS = {'id': id, 'recipename': _recipename, 'recipelink': _recipelink,
+              'recipetype': _recipetype, 'recipecuisine': _recipecuisine}
+
     # Defines a relationship between Recipe record and Notes table, one-to-many (one recipe to many notes)
 
     # constructor of a User object, initializes the instance variables within object (self)
@@ -100,6 +114,32 @@ class Recipe(db.Model):
             "recipecuisine" : self.recipecuisine,
         }
 
+    # Filters a query by recipe types and/or cuisines, case insensitive and served by the indexes above
+    # types, cuisines: lists of values, empty means no filter
+    # returns query
+    @staticmethod
+    def filtered(query, types=(), cuisines=()):
+        if types:
+            query = query.filter(collate(Recipe._recipetype, 'NOCASE').in_(types))
+        if cuisines:
+            query = query.filter(collate(Recipe._recipecuisine, 'NOCASE').in_(cuisines))
+        return query
+
+    # Facet counts per type, per cuisine and per type/cuisine pair, from a single GROUP BY
+    # returns dictionary
+    @staticmethod
+    def facets(types=(), cuisines=()):
+        recipetype = collate(Recipe._recipetype, 'NOCASE')
+        recipecuisine = collate(Recipe._recipecuisine, 'NOCASE')
+        query = db.session.query(func.min(Recipe._recipetype), func.min(Recipe._recipecuisine), func.count(Recipe.id))
+        query = Recipe.filtered(query, types, cuisines).group_by(recipetype, recipecuisine)
+        by_type, by_cuisine, pairs = {}, {}, []
+        for recipetype, recipecuisine, count in query:
+            by_type[recipetype] = by_type.get(recipetype, 0) + count
+            by_cuisine[recipecuisine] = by_cuisine.get(recipecuisine, 0) + count
+            pairs.append({"recipetype": recipetype, "recipecuisine": recipecuisine, "count": count})
+        return {"recipetype": by_type, "recipecuisine": by_cuisine, "pairs": pairs}
+
     # CRUD update: updates user name, password, phone
     # returns self
     def update(self, recipename="", recipelink="", recipetype="", recipecuisine=""):
@@ -127,10 +167,11 @@ class Recipe(db.Model):
 
 
 # Builds working data for testing
+# -- runs from `python manage.py seed`, one transaction for the table, skipped when recipes already exist
 def initRecipes():
     with app.app_context():
-        """Create database and tables"""
-        db.create_all()
+        if Recipe.query.first() is not None:
+            return  # already seeded
         """Tester data for table"""
         r1 = Recipe(recipename='Avocado Toast', recipelink='link1', recipetype='Breakfast', recipecuisine='American')
         r2 = Recipe(recipename='Scrambled Eggs', recipelink='link2', recipetype='Breakfast', recipecuisine='American')
@@ -147,11 +188,10 @@ def initRecipes():
     
         recipes = [r1, r2, r3, r4, r5, r6, r7, r8, r9, r10, r11, r12]
 
-        """Builds sample user/note(s) data"""
-        for recipe in recipes:
-            try:
-                recipe.create()
-            except IntegrityError:
-                '''fails with bad or duplicate data'''
-                db.session.remove()
-                print(f"Records exist, duplicate email, or error: {recipe.model}")
\ No newline at end of file
+        try:
+            db.session.add_all(recipes)
+            db.session.commit()
+        except IntegrityError:
+            '''fails with bad or duplicate data'''
+            db.session.rollback()
+            print("Records exist, duplicate name, or error seeding recipes")
@@ -0,0 +1,148 @@
+""" byte bounded LRU cache of encoded responses, optionally shared by all workers on disk """
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+# Cache of response bodies and the headers that go with them
+# -- memory: LRU bounded by the total size of the bodies, per worker
+# -- disk (optional): one file per entry under `folder`, so a body encoded by one worker is reused by the others,
+#    the least recently used files are removed once they take more than `disk_bytes`
+# -- keys carry the table versions of the response, so a write makes old entries unreachable and LRU drops them
+# -- record (optional): called with the name of each counted event, e.g. to feed a metrics counter shared by workers
+class ResponseCache:
+    PRUNE_EVERY = 64  # disk stores between scans of the folder
+
+    def __init__(self, max_bytes, item_max, folder=None, disk_bytes=0, record=None):
+        self.max_bytes = max_bytes
+        self.item_max = item_max  # larger bodies are not cached
+        self.folder = folder
+        self.disk_bytes = disk_bytes
+        self.record = record
+        self._entries = OrderedDict()  # key -> (body, headers)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stores = 0
+        self.counts = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'skipped': 0}
+
+    # (body bytes, headers dictionary) for key, None on a miss
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._count('hits')
+                return entry
+        entry = self._read(key)
+        with self._lock:
+            if entry is None:
+                self._count('misses')
+                return None
+            self._count('disk_hits')
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key, body, headers):
+        if len(body) > min(self.item_max, self.max_bytes):
+            with self._lock:
+                self._count('skipped')
+            return
+        entry = (body, headers)
+        with self._lock:
+            self._count('stores')
+            self._remember(key, entry)
+        self._write(key, entry)
+
+    # counters and sizes of this worker, a debug view, record gets the events of every worker
+    # returns dictionary
+    def stats(self):
+        with self._lock:
+            lookups = self.counts['hits'] + self.counts['disk_hits'] + self.counts['misses']
+            return dict(self.counts, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes,
+                        hit_ratio=round((lookups - self.counts['misses']) / lookups, 4) if lookups else None,
+                        disk=self.folder is not None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # caller holds the lock
+    def _count(self, event):
+        self.counts[event] += 1
+        if self.record is not None:
+            self.record(event)
+
+    # caller holds the lock
+    def _remember(self, key, entry):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous[0])
+        self._entries[key] = entry
+        self._bytes += len(entry[0])
+        while self._bytes > self.max_bytes:
+            _, (body, _) = self._entries.popitem(last=False)
+            self._bytes -= len(body)
+            self._count('evictions')
+
+    def _path(self, key):
+        return os.path.join(self.folder, hashlib.sha256(key.encode()).hexdigest() + '.response')
+
+    # file layout: one line of JSON with the key and headers, then the body
+    def _read(self, key):
+        if self.folder is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+            os.utime(path)  # the file's mtime doubles as its last use
+        except (OSError, ValueError):
+            return None
+        if meta.get('key') != key:  # hash collision or a damaged file
+            return None
+        return body, meta['headers']
+
+    # writes atomically, readers in other workers never see a partial file
+    def _write(self, key, entry):
+        if self.folder is None:
+            return
+        body, headers = entry
+        path = self._path(key)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(temp, 'wb') as f:
+                f.write(json.dumps({'key': key, 'headers': headers}).encode() + b'\n')
+                f.write(body)
+            os.replace(temp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._stores += 1
+            prune = self._stores % self.PRUNE_EVERY == 0
+        if prune:
+            self._prune()
+
+    # removes the least recently used files until the folder fits in disk_bytes
+    def _prune(self):
+        files = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.response'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,39 @@
+""" schema management, run from the command line (see manage.py) so serving requests never does schema work """
+from __init__ import app, db
+from sqlalchemy import inspect, text
+from model.search import initSearch
+from model.scores import migrateScores
+from model.versions import initVersions
+
+
+# Adds nullable columns that were added to models after their table was created
+# -- ALTER TABLE ADD COLUMN only changes the schema record, existing rows are filled by a backfill later
+def addColumns():
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                print(f"Cannot add NOT NULL column {column.name} to {table.name}, rebuild the table")
+                continue
+            db.session.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+                f"{column.type.compile(dialect=db.engine.dialect)}"))
+    db.session.commit()
+
+
+# Create missing tables, columns and indexes added to models after their table was created
+# -- models must be imported before this runs, main.py imports all of them
+def initSchema():
+    with app.app_context():
+        migrateScores()
+        db.create_all()
+        addColumns()
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+    initSearch()
+    initVersions()
@@ -2,8 +2,11 @@
 from random import randrange
 import os, base64
 import json
+import re
 
 from __init__ import app, db
+from sqlalchemy import func, inspect, text, MetaData
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.exc import IntegrityError
 
 
@@ -14,12 +17,20 @@ class Score(db.Model):
     # Define the User schema with "vars" from object
     id = db.Column(db.Integer, primary_key=True)
     _name = db.Column(db.String(255), unique=True, nullable=False)
-    _score = db.Column(db.String(255), unique=False, nullable=False)
+    _score = db.Column(db.Integer, unique=False, nullable=False)
+
+    # Leaderboard index, ORDER BY score DESC, id LIMIT n and rank counts walk it instead of the table
+    __table_args__ = (
+        db.Index('ix_scores_score', _score.desc(), id),
+    )
+
+    # read() keys and the columns behind them, lets list endpoints serialize rows without building objects
+    FIELDS = {'id': id, 'name': _name, 'score': _score}
 
     # constructor of a User object, initializes the instance variables within object (self)
     def __init__(self, name, score):
         self._name = name    # variables with self prefix become part of the object, 
-        self._score = score
+        self._score = int(score)
 
     # a name getter method, extracts name from object
     @property
@@ -37,10 +48,21 @@ class Score(db.Model):
     
     @score.setter
     def score(self, score):
-        self._score = score
+        self._score = int(score)
         
     def is_score(self, score):
-        return self._score == score
+        return self._score == int(score)
+
+    # Rank of this player, 1 + number of players with a higher score (ties share a rank)
+    # returns integer
+    def rank(self):
+        return 1 + db.session.query(func.count(Score.id)).filter(Score._score > self._score).scalar()
+
+    # Leaderboard, n best scores, ties in order of creation
+    # returns list of Score
+    @staticmethod
+    def top(n=10):
+        return Score.query.order_by(Score._score.desc(), Score.id).limit(n).all()
     
     @property
     def __str__(self):
@@ -67,11 +89,11 @@ class Score(db.Model):
 
     # CRUD update: updates user name, password, phone
     # returns self
-    def update(self, name="", score=""):
+    def update(self, name="", score=None):
         """only updates values with length"""
         if len(name) > 0:
             self.name = name
-        if len(score) > 0:
+        if score is not None:
             self.score = score
         db.session.commit()
         return self
@@ -83,31 +105,69 @@ class Score(db.Model):
         db.session.commit()
         return None
 
+"""Migration """
+
+
+WHOLE_NUMBER = re.compile(r'[+-]?\d+(\.0*)?$')  # legacy text scores CAST converts without loss
+
+
+# Rebuilds a scores table created with a text score column, so scores sort as numbers
+# -- SQLite cannot change a column type, the rows are copied into a new table,
+#    run as one script between BEGIN and COMMIT so readers see either the old or the new table
+# -- stops with an error, table untouched, when a score is not a whole number
+def migrateScores():
+    with app.app_context():
+        inspector = inspect(db.engine)
+        if not inspector.has_table(Score.__tablename__):
+            return
+        columns = {column['name']: column for column in inspector.get_columns(Score.__tablename__)}
+        if isinstance(columns['_score']['type'], db.Integer):
+            return
+        # CAST turns text that is not a number into 0, those rows would rank as real scores
+        with db.engine.connect() as connection:
+            rows = connection.execute(text(f"SELECT id, _score FROM {Score.__tablename__}")).all()
+        invalid = [id for id, score in rows if not WHOLE_NUMBER.match(str(score).strip())]
+        if invalid:
+            raise RuntimeError(f"{Score.__tablename__} has {len(invalid)} scores that are not whole numbers, "
+                               f"ids {invalid[:20]}; fix or delete them, then start again to convert the column")
+        rebuilt = Score.__table__.to_metadata(MetaData(), name=Score.__tablename__ + '_rebuilt')
+        connection = db.engine.raw_connection()
+        try:
+            connection.executescript(f"""
+                BEGIN;
+                {CreateTable(rebuilt).compile(db.engine)};
+                INSERT INTO {rebuilt.name} (id, _name, _score)
+                    SELECT id, _name, CAST(_score AS INTEGER) FROM {Score.__tablename__};
+                DROP TABLE {Score.__tablename__};
+                ALTER TABLE {rebuilt.name} RENAME TO {Score.__tablename__};
+                COMMIT;
+            """)
+        finally:
+            connection.close()
+        print(f"Rebuilt {Score.__tablename__} with integer scores")
+
+
 """Database Creation and Testing """
 
+# Builds working data for testing
+# -- runs from `python manage.py seed`, one transaction for the table, skipped when scores already exist
 def initScores():
     with app.app_context():
-        """Create database and tables"""
-        # db.init_app(app)
-        db.create_all()
+        if Score.query.first() is not None:
+            return  # already seeded
         """Tester data for table"""
-        u1 = Score(name='Shruthi', score='2')
-        u2 = Score(name='Lina', score='3')
-        u3 = Score(name='Lydia', score='1')
-        u4 = Score(name='Sarah', score='5')
-        u5 = Score(name='Jake', score='6')
+        u1 = Score(name='Shruthi', score=2)
+        u2 = Score(name='Lina', score=3)
+        u3 = Score(name='Lydia', score=1)
+        u4 = Score(name='Sarah', score=5)
+        u5 = Score(name='Jake', score=6)
 
         users = [u1, u2, u3, u4, u5]
 
-        """Builds sample user/note(s) data"""
-        for user in users:
-            try:
-                '''add a few 1 to 4 notes per user'''
-                for num in range(randrange(1, 4)):
-                    note = "#### " + user.name + " note " + str(num) + ". \n Generated by test data."
-                '''add user/post data to table'''
-                user.create()
-            except IntegrityError:
-                '''fails with bad or duplicate data'''
-                db.session.remove()
-                print(f"Records exist, duplicate email, or error: {user.score}")
\ No newline at end of file
+        try:
+            db.session.add_all(users)
+            db.session.commit()
+        except IntegrityError:
+            '''fails with bad or duplicate data'''
+            db.session.rollback()
+            print("Records exist, duplicate name, or error seeding scores")
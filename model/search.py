@@ -0,0 +1,89 @@
+""" full text search over recipe, fridge and nutrition names, backed by SQLite FTS5 """
+import re
+
+from __init__ import app, db
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from model.recipes import Recipe
+from model.fridges import Fridge
+from model.nutritions import Nutrition
+
+
+''' FTS5 docs: https://www.sqlite.org/fts5.html '''
+
+# Searchable tables: kind -> (model, name column, rowid offset)
+# -- an index row has rowid = id * 4 + offset, so triggers update or delete it without a scan
+SEARCH_SOURCES = {
+    'recipe': (Recipe, '_recipename', 1),
+    'fridge': (Fridge, '_recname', 2),
+    'nutrition': (Nutrition, '_nutritionname', 3),
+}
+SEARCH_TABLE = 'search_index'
+
+
+# quoted table name, ' nutritions' has a leading space
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# DDL for one source: an insert, update and delete trigger keeping the index in step with the table
+def _triggers(kind, model, column, offset):
+    table = _quote(model.__tablename__)
+    rowid = f"{{row}}.id * 4 + {offset}"
+    add = (f"INSERT INTO {SEARCH_TABLE}(rowid, name, kind, ref) "
+           f"VALUES ({rowid.format(row='new')}, new.{column}, '{kind}', new.id);")
+    remove = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {rowid.format(row='old')};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS search_{kind}_insert AFTER INSERT ON {table} BEGIN {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS search_{kind}_update AFTER UPDATE OF {column} ON {table} BEGIN {remove} {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS search_{kind}_delete AFTER DELETE ON {table} BEGIN {remove} END",
+    ]
+
+
+# Create the index and its triggers, filling the index from existing rows when it is new
+# -- runs from `python manage.py init-db` / `seed` after the tables exist
+def initSearch():
+    with app.app_context():
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': SEARCH_TABLE}).first()
+        try:
+            if not exists:
+                db.session.execute(text(
+                    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                    "name, kind UNINDEXED, ref UNINDEXED, tokenize = 'unicode61', prefix = '2 3')"))
+            for kind, (model, column, offset) in SEARCH_SOURCES.items():
+                for statement in _triggers(kind, model, column, offset):
+                    db.session.execute(text(statement))
+                if not exists:
+                    db.session.execute(text(
+                        f"INSERT INTO {SEARCH_TABLE}(rowid, name, kind, ref) "
+                        f"SELECT id * 4 + {offset}, {column}, '{kind}', id FROM {_quote(model.__tablename__)}"))
+            db.session.commit()
+        except OperationalError as e:
+            db.session.rollback()
+            print(f"Search index unavailable, SQLite needs FTS5: {e.orig}")
+
+
+# FTS5 query from user text, every word must match as a prefix: pas sal -> "pas"* "sal"*
+def match_query(q):
+    words = re.findall(r'\w+', q)
+    return ' '.join('"' + word.replace('"', '""') + '"*' for word in words)
+
+
+# Ranked search, best bm25 score first
+# kinds: list of SEARCH_SOURCES keys, empty means all
+# returns list of dictionaries
+def search(q, kinds=(), limit=20, offset=0):
+    match = match_query(q)
+    if not match:
+        return []
+    where = f"{SEARCH_TABLE} MATCH :match"
+    params = {'match': match, 'limit': limit, 'offset': offset}
+    if kinds:
+        where += " AND kind IN (" + ", ".join(f":kind{i}" for i in range(len(kinds))) + ")"
+        params.update({f"kind{i}": kind for i, kind in enumerate(kinds)})
+    rows = db.session.execute(text(
+        f"SELECT kind, ref, name, rank FROM {SEARCH_TABLE} WHERE {where} "
+        "ORDER BY rank LIMIT :limit OFFSET :offset"), params)
+    return [{"kind": kind, "id": ref, "name": name, "score": round(-rank, 4)} for kind, ref, name, rank in rows]
@@ -0,0 +1,178 @@
+""" stale-while-revalidate cache for slow upstream data, shared by all workers """
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl  # file locks coordinate gunicorn workers, not available on Windows
+except ImportError:
+    fcntl = None
+
+
+# Cache of one upstream payload
+# -- fresh for `ttl` seconds, then served stale while a background thread refreshes it
+# -- past `ttl + stale` the caller waits for the refresh (or keeps the stale copy if upstream fails)
+# -- the last good payload is persisted to `folder`, so a restarted worker serves it immediately
+# -- a lock file makes the refresh single-flight, one upstream call per expiry across all workers
+# -- after a failed fetch no worker calls upstream again for `retry` seconds, a marker file records the failure
+class SWRCache:
+    def __init__(self, name, fetch, folder, ttl=86400, stale=86400, prepare=None, retry=60):
+        self.fetch = fetch  # function returning the decoded upstream payload, raises on failure
+        self.prepare = prepare  # optional function payload -> structure kept alongside it in memory
+        self.ttl = ttl
+        self.stale = stale
+        self.retry = retry
+        self.path = os.path.join(folder, name + '.json')
+        self.lock_path = self.path + '.lock'
+        self.failed_path = self.path + '.failed'
+        self._entry = None  # {'fetched': epoch seconds, 'payload': ..., 'prepared': ...}
+        self._mtime = None  # mtime of the file _entry was loaded from or written to
+        self._lock = threading.Lock()  # single flight between threads of this worker
+        self._refreshing = False
+        self.error = None  # last upstream error, for diagnostics
+
+    # payload, refreshed according to the ttl rules above
+    def get(self):
+        return self._current('payload')
+
+    # prepared structure, built once per refresh
+    def prepared(self):
+        return self._current('prepared')
+
+    def _current(self, key):
+        entry = self._entry
+        if entry is None or self._age(entry) > self.ttl:
+            entry = self._load() or entry  # another worker may have refreshed already
+        if entry is None:
+            entry = self._refresh(wait=True)
+        else:
+            age = self._age(entry)
+            if age > self.ttl + self.stale:
+                entry = self._refresh(wait=True) or entry
+            elif age > self.ttl:
+                self._refresh_background()
+        return entry[key] if entry else None
+
+    def _age(self, entry):
+        return time.time() - entry['fetched']
+
+    def _set(self, fetched, payload):
+        prepared = self.prepare(payload) if self.prepare else None
+        self._entry = {'fetched': fetched, 'payload': payload, 'prepared': prepared}
+        return self._entry
+
+    # reads the persisted payload when the file changed since we last saw it
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime == self._mtime and self._entry is not None:
+            return self._entry
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._mtime = mtime
+        return self._set(saved['fetched'], saved['payload'])
+
+    # True while the last failed fetch, by any worker, is less than retry seconds old
+    def _recently_failed(self):
+        try:
+            failed = os.stat(self.failed_path).st_mtime
+        except OSError:
+            return False
+        return time.time() - failed < self.retry
+
+    def _mark_failed(self):
+        try:
+            os.makedirs(os.path.dirname(self.failed_path) or '.', exist_ok=True)
+            with open(self.failed_path, 'a'):
+                pass
+            os.utime(self.failed_path)
+        except OSError:
+            pass
+
+    # writes the payload atomically, readers never see a partial file
+    def _save(self, fetched, payload):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'fetched': fetched, 'payload': payload}, f)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def _refresh_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, kwargs={'wait': False, 'claimed': True}, daemon=True).start()
+
+    # fetches upstream while holding the worker lock file
+    # wait=False gives up when another worker is already refreshing
+    # returns the new entry, or None on failure and while backing off after one
+    def _refresh(self, wait=True, claimed=False):
+        if not claimed:
+            with self._lock:
+                self._refreshing = True
+        try:
+            if self._recently_failed():
+                return None
+            with self._lock_file(wait) as locked:
+                if not locked:
+                    return None
+                entry = self._load()  # a worker that held the lock before us may have just written it
+                if entry is not None and self._age(entry) <= self.ttl:
+                    return entry
+                if self._recently_failed():  # the worker we waited for failed, do not queue another timeout
+                    return None
+                try:
+                    payload = self.fetch()
+                except Exception as e:
+                    self.error = repr(e)
+                    self._mark_failed()
+                    return None
+                self.error = None
+                try:
+                    os.remove(self.failed_path)
+                except OSError:
+                    pass
+                fetched = time.time()
+                self._save(fetched, payload)
+                return self._set(fetched, payload)
+        finally:
+            self._refreshing = False
+
+    def _lock_file(self, wait):
+        return _LockFile(self.lock_path, wait)
+
+
+# Context manager around an exclusive flock, yields whether the lock is held
+class _LockFile:
+    def __init__(self, path, wait):
+        self.path = path
+        self.wait = wait
+        self.file = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.file = open(self.path, 'a')
+        flags = fcntl.LOCK_EX if self.wait else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(self.file, flags)
+        except BlockingIOError:
+            self.file.close()
+            self.file = None
+            return False
+        return True
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+        return False
@@ -1,16 +1,72 @@
 """ database dependencies to support sqliteDB examples """
 from random import randrange
 from datetime import date
-import os, base64
+from collections import OrderedDict
+import os, base64, hashlib
 import json
+import threading
 
 from __init__ import app, db
+from sqlalchemy import select, func
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import column_property, selectinload, joinedload, undefer, noload, load_only
 from werkzeug.security import generate_password_hash, check_password_hash
 
 
 ''' Tutorial: https://www.sqlalchemy.org/library.html#tutorials, try to get into Python shell and follow along '''
 
+''' Post images are served by reference, the URL below is routed by api/user.py '''
+IMAGE_URL = '/api/users/images/'
+
+# content hash per image file, keyed on (path, mtime, size) so edits on disk are picked up
+_image_hashes = {}
+# LRU of legacy base64 encodings keyed by content hash, many posts share the same image
+_image_encodings = OrderedDict()
+_image_lock = threading.Lock()
+IMAGE_ENCODINGS_MAX = 32
+
+
+# path of an uploaded image, None when the post has no image
+def image_path(image):
+    if not image:
+        return None
+    return os.path.join(app.config['UPLOAD_FOLDER'], image)
+
+
+# sha256 of an image file, None when missing
+def image_hash(image):
+    file = image_path(image)
+    try:
+        stat = os.stat(file)
+    except (TypeError, OSError):
+        return None
+    key = (file, stat.st_mtime_ns, stat.st_size)
+    digest = _image_hashes.get(key)
+    if digest is None:
+        with open(file, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        _image_hashes[key] = digest
+    return digest
+
+
+# legacy inline encoding of an image, read from disk once per distinct content
+def image_base64(image):
+    digest = image_hash(image)
+    if digest is None:
+        return None
+    with _image_lock:
+        if digest in _image_encodings:
+            _image_encodings.move_to_end(digest)
+            return _image_encodings[digest]
+    with open(image_path(image), 'rb') as f:
+        encoded = str(base64.encodebytes(f.read()))
+    with _image_lock:
+        _image_encodings[digest] = encoded
+        if len(_image_encodings) > IMAGE_ENCODINGS_MAX:
+            _image_encodings.popitem(last=False)
+    return encoded
+
+
 # Define the Post class to manage actions in 'posts' table,  with a relationship to 'users' table
 class Post(db.Model):
     __tablename__ = 'posts'
@@ -20,7 +76,7 @@ class Post(db.Model):
     note = db.Column(db.Text, unique=False, nullable=False)
     image = db.Column(db.String, unique=False)
     # Define a relationship in Notes Schema to userID who originates the note, many-to-one (many notes to one user)
-    userID = db.Column(db.Integer, db.ForeignKey('users.id'))
+    userID = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)  # posts of a user without a table scan
 
     # Constructor of a Notes object, initializes of instance variables within object
     def __init__(self, id, note, image):
@@ -46,21 +102,29 @@ class Post(db.Model):
             return None
 
     # CRUD read, returns dictionary representation of Notes object
+    # the image is referenced by url and content hash, inline=True adds the legacy base64 copy
     # returns dictionary
-    def read(self):
-        # encode image
-        path = app.config['UPLOAD_FOLDER']
-        file = os.path.join(path, self.image)
-        file_text = open(file, 'rb')
-        file_read = file_text.read()
-        file_encode = base64.encodebytes(file_read)
-        
-        return {
+    def read(self, inline=False):
+        data = {
             "id": self.id,
             "userID": self.userID,
             "note": self.note,
             "image": self.image,
-            "base64": str(file_encode)
+            "url": IMAGE_URL + self.image if self.image else None,
+            "hash": image_hash(self.image)
+        }
+        if inline:
+            data["base64"] = image_base64(self.image)
+        return data
+
+    # CRUD read without the image payload, used for user listings
+    # returns dictionary
+    def summary(self):
+        return {
+            "id": self.id,
+            "userID": self.userID,
+            "note": self.note,
+            "image": self.image
         }
 
 
@@ -81,6 +145,16 @@ class User(db.Model):
 
     # Defines a relationship between User record and Notes table, one-to-many (one user to many notes)
     posts = db.relationship("Post", cascade='all, delete', backref='users', lazy=True)
+    # Number of posts, computed in SQL and only loaded when asked for (see posts_options)
+    post_count = column_property(
+        select(func.count(Post.id)).where(Post.userID == id).correlate_except(Post).scalar_subquery(),
+        deferred=True)
+
+    # How posts are represented by read(): full posts, summaries (no image), a count, or left out
+    POST_MODES = ('full', 'summary', 'count', 'none')
+
+    # read() keys and the attributes each is built from, ?fields= loads only these ('posts' is the relationship)
+    READ_COLUMNS = {'id': ['id'], 'name': ['_name'], 'uid': ['_uid'], 'dob': ['_dob'], 'age': ['_dob'], 'posts': []}
 
     # constructor of a User object, initializes the instance variables within object (self)
     def __init__(self, name, uid, password="123qwerty", dob=date.today()):
@@ -161,17 +235,41 @@ class User(db.Model):
             db.session.remove()
             return None
 
+    # Loader options for a query of users that will be read() with the given posts mode
+    # -- lists use selectin loading, one extra SELECT ... WHERE userID IN (...) per batch of users
+    # -- single user lookups use a joined load, one round trip in total
+    # fields: optional keys of READ_COLUMNS, only their columns are loaded and posts only when listed
+    # returns list of query options
+    @staticmethod
+    def posts_options(posts='full', many=True, fields=None):
+        options = []
+        if fields is not None:
+            columns = {column for field in fields for column in User.READ_COLUMNS[field]}
+            options.append(load_only(User.id, *(getattr(User, column) for column in columns)))
+            if 'posts' not in fields:
+                posts = 'none'
+        if posts == 'count':
+            return options + [undefer(User.post_count), noload(User.posts)]
+        if posts == 'none':
+            return options + [noload(User.posts)]
+        return options + [selectinload(User.posts) if many else joinedload(User.posts)]
+
     # CRUD read converts self to dictionary
+    # posts selects one of POST_MODES, inline adds base64 images to full posts
+    # fields limits the keys to some of READ_COLUMNS, derived values like age are only computed when asked for
     # returns dictionary
-    def read(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "uid": self.uid,
-            "dob": self.dob,
-            "age": self.age,
-            "posts": [post.read() for post in self.posts]
-        }
+    def read(self, posts='full', inline=False, fields=None):
+        data = {}
+        for field in fields or User.READ_COLUMNS:
+            if field != 'posts':
+                data[field] = getattr(self, field)
+            elif posts == 'full':
+                data["posts"] = [post.read(inline=inline) for post in self.posts]
+            elif posts == 'summary':
+                data["posts"] = [post.summary() for post in self.posts]
+            elif posts == 'count':
+                data["posts"] = self.post_count
+        return data
 
     # CRUD update: updates user name, password, phone
     # returns self
@@ -198,10 +296,11 @@ class User(db.Model):
 
 
 # Builds working data for testing
+# -- runs from `python manage.py seed`, one transaction for the table, skipped when users already exist
 def initUsers():
     with app.app_context():
-        """Create database and tables"""
-        db.create_all()
+        if User.query.first() is not None:
+            return  # already seeded
         """Tester data for table"""
         u1 = User(name='Thomas Edison', uid='toby', password='123toby', dob=date(1847, 2, 11))
         u2 = User(name='Nicholas Tesla', uid='niko', password='123niko')
@@ -213,14 +312,15 @@ def initUsers():
 
         """Builds sample user/note(s) data"""
         for user in users:
-            try:
-                '''add a few 1 to 4 notes per user'''
-                for num in range(randrange(1, 4)):
-                    note = "#### " + user.name + " note " + str(num) + ". \n Generated by test data."
-                    user.posts.append(Post(id=user.id, note=note, image='ncs_logo.png'))
-                '''add user/post data to table'''
-                user.create()
-            except IntegrityError:
-                '''fails with bad or duplicate data'''
-                db.session.remove()
-                print(f"Records exist, duplicate email, or error: {user.uid}")
\ No newline at end of file
+            '''add a few 1 to 4 notes per user'''
+            for num in range(randrange(1, 4)):
+                note = "#### " + user.name + " note " + str(num) + ". \n Generated by test data."
+                user.posts.append(Post(id=user.id, note=note, image='ncs_logo.png'))
+        try:
+            '''add user/post data to table'''
+            db.session.add_all(users)
+            db.session.commit()
+        except IntegrityError:
+            '''fails with bad or duplicate data'''
+            db.session.rollback()
+            print("Records exist, duplicate uid, or error seeding users")
@@ -0,0 +1,58 @@
+""" per table change counters, shared by all workers through the database """
+import time
+
+from __init__ import app, db
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert
+
+
+# One row per table, version goes up by one for every row inserted, updated or deleted
+# -- kept by triggers created in initVersions, so ORM writes, Core bulk inserts, query deletes
+#    and migrations are all counted, whichever worker or script runs them
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    name = db.Column(db.String(255), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    modified = db.Column(db.Float, nullable=False, default=0)  # unix time of the last change
+
+    # Versions of some tables, a single primary key lookup
+    # tables: table names
+    # returns (dictionary of name -> version, latest modified time), tables without a row count as version 0
+    @staticmethod
+    def of(tables):
+        rows = db.session.execute(db.select(TableVersion.name, TableVersion.version, TableVersion.modified)
+                                  .where(TableVersion.name.in_(tables))).all()
+        return {name: version for name, version, _ in rows}, max((modified for _, _, modified in rows), default=0)
+
+
+# SQLite has no unixepoch() before 3.38
+NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+
+# quoted table name, ' nutritions' has a leading space
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# DDL for one table: insert, update and delete triggers bumping its version
+def _triggers(name):
+    table = _quote(name)
+    literal = "'" + name.replace("'", "''") + "'"
+    bump = f"UPDATE {TableVersion.__tablename__} SET version = version + 1, modified = {NOW} WHERE name = {literal};"
+    slug = name.strip().replace(' ', '_')
+    return [f"CREATE TRIGGER IF NOT EXISTS version_{slug}_{change.lower()} AFTER {change} ON {table} BEGIN {bump} END"
+            for change in ('INSERT', 'UPDATE', 'DELETE')]
+
+
+# Version rows and triggers for every model table
+# -- runs from `python manage.py init-db` / `seed` after the tables exist, and again after a table is rebuilt
+def initVersions():
+    with app.app_context():
+        tables = [table.name for table in db.metadata.sorted_tables if table.name != TableVersion.__tablename__]
+        db.session.execute(insert(TableVersion.__table__).on_conflict_do_nothing(),
+                           [{'name': name, 'version': 0, 'modified': time.time()} for name in tables])
+        for name in tables:
+            for statement in _triggers(name):
+                db.session.execute(text(statement))
+        db.session.commit()
@@ -0,0 +1,35 @@
+""" pytest setup: a throwaway database and SQL diagnostics, set before the app is imported """
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # the project root holds __init__.py, modules import as `from __init__ import app`
+
+folder = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, folder, True)
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(folder, 'test.db')
+os.environ['COVID_CACHE_FOLDER'] = folder + '/'
+os.environ['COVID_API_URL'] = 'http://127.0.0.1:9/api'  # nothing listens, covid is not under test
+os.environ['SQL_DIAGNOSTICS'] = '1'
+
+
+# App with the tester data plus enough generated rows for a few pages of every list
+@pytest.fixture(scope='session')
+def app():
+    from main import app, initSchema, seedData, generateData
+    initSchema()
+    seedData()
+    generateData(users=50, recipes=50, fridges=50, nutritions=50, scores=50, seed=1)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    from api.conditional import response_cache
+    response_cache.clear()  # every test starts with the endpoints' own queries
+    return app.test_client()
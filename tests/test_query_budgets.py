@@ -0,0 +1,69 @@
+""" every route in SQL_QUERY_BUDGETS stays within its budget, see api/diagnostics.py """
+import pytest
+
+# route -> (method, path, json body) of a typical request
+REQUESTS = {
+    '/api/users/': ('GET', '/api/users/?limit=5', None),
+    '/api/users/authenticate': ('POST', '/api/users/authenticate', {'uid': 'toby', 'password': '123toby'}),
+    '/api/recipes/': ('GET', '/api/recipes/?limit=5&type=dinner', None),
+    '/api/recipes/facets': ('GET', '/api/recipes/facets?cuisine=italian', None),
+    '/api/fridges/': ('GET', '/api/fridges/?limit=5', None),
+    '/api/nutriitons/': ('GET', '/api/nutriitons/?limit=5&sort=-fat', None),
+    '/api/nutriitons/totals': ('POST', '/api/nutriitons/totals', {'items': [['Apple', 2], [2, 0.5]]}),
+    '/api/scores/': ('GET', '/api/scores/?limit=5', None),
+    '/api/scores/top': ('GET', '/api/scores/top?n=5', None),
+    '/api/scores/rank/<string:name>': ('GET', '/api/scores/rank/Jake', None),
+    '/api/search': ('GET', '/api/search?q=pas', None),
+    '/api/search/': ('GET', '/api/search/?q=apple&kind=nutrition', None),
+    '/api/jokes/': ('GET', '/api/jokes/', None),
+    '/api/jokes/top': ('GET', '/api/jokes/top?n=3', None),
+}
+LISTS = [route for route, (method, path, _) in REQUESTS.items() if method == 'GET' and 'limit=' in path]
+CONDITIONAL = ['/api/users/', '/api/recipes/', '/api/recipes/facets', '/api/fridges/', '/api/nutriitons/',
+               '/api/scores/', '/api/scores/top']
+
+
+def within_budget(response):
+    assert 'X-Query-Budget' in response.headers, 'route has no entry in SQL_QUERY_BUDGETS'
+    count, budget = int(response.headers['X-Query-Count']), int(response.headers['X-Query-Budget'])
+    assert count <= budget, f'{count} statements, budget {budget}'
+
+
+def test_every_budget_has_a_request(app):
+    assert set(app.config['SQL_QUERY_BUDGETS']) == set(REQUESTS)
+
+
+@pytest.mark.parametrize('route', REQUESTS)
+def test_within_budget(client, route):
+    method, path, body = REQUESTS[route]
+    response = client.open(path, method=method, json=body)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    within_budget(response)
+
+
+@pytest.mark.parametrize('route', LISTS)
+def test_pages_within_budget(client, route):
+    _, path, _ = REQUESTS[route]
+    pages = 0
+    while path and pages < 4:
+        response = client.get(path)
+        assert response.status_code == 200
+        within_budget(response)
+        pages += 1
+        link = response.headers.get('Link')
+        path = link[1:link.index('>')] if link else None
+    assert pages > 1, 'expected more than one page of generated rows'
+
+
+@pytest.mark.parametrize('route', CONDITIONAL)
+def test_cached_and_not_modified_within_budget(client, route):
+    _, path, _ = REQUESTS[route]
+    first = client.get(path)
+    assert first.headers['X-Cache'] == 'MISS'
+    cached = client.get(path)
+    assert cached.headers['X-Cache'] == 'HIT'
+    assert cached.get_data() == first.get_data()
+    within_budget(cached)
+    not_modified = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+    within_budget(not_modified)